@@ -1,16 +1,46 @@
 import streamlit as st
-from src.auth import validar_usuario
+
+# Los módulos de cada ruta (y pandas, numpy, mysql.connector detrás de ellos)
+# se importan recién cuando se usan por primera vez; el login solo carga src.auth.
+# Tiempos de importación: python -m src.bench_arranque
 
 # Configuración básica de la página
 st.set_page_config(page_title="Sistema Vidrios", layout="wide")
 
+# El token de sesión va en una cookie, no en la URL (historial, enlaces
+# compartidos, logs de proxies). Streamlit solo puede leer cookies
+# (st.context.cookies, las de la conexión inicial): se escribe desde el navegador.
+COOKIE_SESION = "sesion"
+
+
+def _escribir_cookie(valor, max_age):
+    st.html(
+        "<script>document.cookie = "
+        f"'{COOKIE_SESION}={valor}; Path=/; Max-Age={int(max_age)}; SameSite=Strict'"
+        " + (location.protocol === 'https:' ? '; Secure' : '');</script>",
+        unsafe_allow_javascript=True
+    )
+
+
 def main():
     # Inicializar el estado de la sesión si no existe
     if 'usuario' not in st.session_state:
         st.session_state.usuario = None
 
+    # Recarga del navegador: la identidad vuelve desde la cookie de sesión
+    token = st.context.cookies.get(COOKIE_SESION)
+    if st.session_state.usuario is None and token and not st.session_state.get('cookie_vencida'):
+        from src.auth import restaurar_sesion
+        st.session_state.usuario = restaurar_sesion(token)
+        if st.session_state.usuario is None:
+            st.session_state.cookie_vencida = True
+        else:
+            st.session_state.token_sesion = token
+
     # --- PANTALLA DE LOGIN ---
     if st.session_state.usuario is None:
+        if st.session_state.get('cookie_vencida'):
+            _escribir_cookie("", 0)
         st.title("🔐 Control de Producción - Login")
         
         col1, col2 = st.columns([1, 1])
@@ -21,9 +51,16 @@ def main():
                 submit = st.form_submit_button("Ingresar")
 
                 if submit:
-                    user_data = validar_usuario(user_input, pass_input)
+                    from src.auth import validar_usuario, emitir_token
+                    from src.metricas import en_pagina
+                    with en_pagina('login'):
+                        user_data = validar_usuario(user_input, pass_input)
                     if user_data:
                         st.session_state.usuario = user_data
+                        # La cookie se escribe en el próximo rerun (st.rerun corta este)
+                        st.session_state.token_sesion = emitir_token(user_data)
+                        st.session_state.cookie_pendiente = st.session_state.token_sesion is not None
+                        st.session_state.cookie_vencida = False
                         st.success(f"Bienvenido {user_data['nombre_usuario']}")
                         st.rerun()
                     else:
@@ -34,21 +71,35 @@ def main():
         rol = st.session_state.usuario['rol']
         nombre = st.session_state.usuario['nombre_usuario']
 
+        if st.session_state.pop('cookie_pendiente', False):
+            from src.auth import VIGENCIA_TOKEN
+            _escribir_cookie(st.session_state.token_sesion, VIGENCIA_TOKEN)
+
         # Barra lateral común
         st.sidebar.title(f"Bienvenido, {nombre}")
         st.sidebar.write(f"Rol: **{rol.upper()}**")
         
         if st.sidebar.button("Cerrar Sesión"):
+            from src.auth import cerrar_sesion
+            # Borra la sesión en la base: la cookie deja de valer en todos los procesos
+            cerrar_sesion(st.session_state.pop('token_sesion', None))
             st.session_state.usuario = None
+            st.session_state.cookie_vencida = True
             st.rerun()
 
-        # Diferenciar Vistas
+        # Diferenciar Vistas. Las consultas de cada rerun quedan etiquetadas con
+        # la página para el panel de rendimiento (src/metricas.py) y asociadas a
+        # la sesión, para leer del primario después de escribir (src/database.py)
+        from src.metricas import en_pagina
+        from src.database import en_sesion
         if rol == 'supervisor':
             import src.supervisor as supervisor_view
-            supervisor_view.mostrar_pantalla()
+            with en_pagina('supervisor'), en_sesion(st.session_state):
+                supervisor_view.mostrar_pantalla()
         else:
             import src.personal as personal_view
-            personal_view.mostrar_pantalla()
+            with en_pagina('personal'), en_sesion(st.session_state):
+                personal_view.mostrar_pantalla()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
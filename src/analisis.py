@@ -0,0 +1,78 @@
+import streamlit as st
+import pandas as pd
+from datetime import date, timedelta
+from src.database import get_connection
+from src import resumenes, calculos
+
+# Pantalla de análisis del supervisor. Solo lee resumen_ordenes_dia y
+# resumen_tandas_dia (src/resumenes.py), nunca produccion.
+
+ETIQUETAS = {'dia': 'Día', 'maquina': 'Máquina', 'operador': 'Operador', 'destino': 'Destino'}
+
+
+def mostrar_pantalla():
+    st.title("Análisis de Producción")
+    st.caption("Totales por día, máquina, operador y destino. Se actualizan al finalizar cada tanda.")
+
+    hoy = date.today()
+    rango = st.date_input("Rango de fechas:", value=(hoy - timedelta(days=30), hoy), key="analisis_rango")
+    if not isinstance(rango, (tuple, list)) or len(rango) != 2:
+        st.info("Seleccione la fecha de inicio y la de fin.")
+        return
+    desde, hasta = rango
+
+    dimensiones = st.multiselect(
+        "Agrupar por:", list(ETIQUETAS), default=['maquina'],
+        format_func=ETIQUETAS.get, key="analisis_dimensiones"
+    )
+    dims_tandas = [d for d in dimensiones if d in resumenes.DIMENSIONES_TANDAS]
+
+    conn = get_connection(solo_lectura=True)
+    if not conn:
+        st.error("No se pudo conectar a la base de datos.")
+        return
+    try:
+        ordenes = pd.DataFrame(resumenes.consultar_ordenes(conn, desde, hasta, dimensiones))
+        tandas = pd.DataFrame(resumenes.consultar_tandas(conn, desde, hasta, dims_tandas))
+        por_dia = pd.DataFrame(resumenes.consultar_tandas(conn, desde, hasta, ['dia']))
+    finally:
+        conn.close()
+
+    if ordenes.empty or ordenes['ordenes'].isna().all():
+        st.info("No hay producción finalizada en ese rango.")
+        return
+
+    # SUM() de MySQL llega como Decimal
+    for df in (ordenes, tandas, por_dia):
+        for col in df.columns:
+            if col not in ETIQUETAS:
+                df[col] = pd.to_numeric(df[col]).fillna(0)
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Tandas", f"{int(tandas['tandas'].sum()):,}")
+    c2.metric("Planchas", f"{int(tandas['planchas'].sum()):,}")
+    c3.metric("Órdenes", f"{int(ordenes['ordenes'].sum()):,}")
+    c4.metric("Merma (kg)", f"{ordenes['merma_kg'].sum():,.1f}")
+
+    st.markdown("#### 📦 Órdenes")
+    ordenes['tiempo_ponderado'] = ordenes['segundos_ponderados'].map(calculos.segundos_a_hhmmss)
+    st.dataframe(
+        ordenes.drop(columns=['segundos_ponderados']).rename(columns=ETIQUETAS),
+        hide_index=True, use_container_width=True
+    )
+
+    st.markdown("#### 🔩 Tandas y planchas")
+    tandas['tiempo'] = tandas['segundos'].map(calculos.segundos_a_hhmmss)
+    st.dataframe(
+        tandas.drop(columns=['segundos']).rename(columns=ETIQUETAS),
+        hide_index=True, use_container_width=True
+    )
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        st.markdown("**Planchas por día**")
+        st.line_chart(por_dia.set_index('dia')['planchas'])
+    with col_b:
+        if dimensiones:
+            st.markdown(f"**Merma (kg) por {ETIQUETAS[dimensiones[0]].lower()}**")
+            st.bar_chart(ordenes.groupby(dimensiones[0])['merma_kg'].sum())
@@ -1,17 +1,216 @@
-from src.database import get_connection
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+from src.cache import CacheTTL
+
+# src.database (mysql.connector, dotenv) se importa dentro de las funciones que
+# van a la base: mostrar el formulario de login no lo necesita.
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CLAVES
+# Se guardan como pbkdf2_sha256$iteraciones$sal$hash. Una clave antigua en
+# texto plano se acepta una vez y se reemplaza por su hash en ese login.
+# ─────────────────────────────────────────────────────────────────────────────
+
+PREFIJO_HASH = "pbkdf2_sha256"
+ITERACIONES = int(os.getenv("AUTH_PBKDF2_ITER", 200_000))
+
+
+def hashear_clave(clave, sal=None, iteraciones=ITERACIONES):
+    sal = sal or secrets.token_hex(16)
+    dk = hashlib.pbkdf2_hmac("sha256", clave.encode(), bytes.fromhex(sal), iteraciones)
+    return f"{PREFIJO_HASH}${iteraciones}${sal}${dk.hex()}"
+
+
+def verificar_clave(clave, guardada):
+    if not guardada:
+        return False
+    if not guardada.startswith(PREFIJO_HASH + "$"):
+        return hmac.compare_digest(clave.encode(), guardada.encode())
+    try:
+        _, iteraciones, sal, _ = guardada.split("$")
+        calculada = hashear_clave(clave, sal, int(iteraciones))
+    except ValueError:
+        # Hash mal formado en la base: no coincide con ninguna clave
+        return False
+    return hmac.compare_digest(calculada, guardada)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# DIRECTORIO DE USUARIOS
+# Sin caché: cada intento de login lee el hash de la base, así un cambio de
+# clave o una baja valen enseguida en todos los procesos. El pbkdf2 cuesta
+# más que la consulta.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _buscar_usuario(nombre_usuario):
+    from src.database import get_connection
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("No hay conexión a la base de datos.")
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT id, nombre_usuario, rol, clave FROM usuarios WHERE nombre_usuario = %s",
+            (nombre_usuario,)
+        )
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def _actualizar_hash(id_usuario, clave):
+    from src.database import get_connection
+    conn = get_connection()
+    if not conn:
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE usuarios SET clave = %s WHERE id = %s", (hashear_clave(clave), id_usuario))
+        conn.commit()
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        conn.close()
+
 
 def validar_usuario(nombre_usuario, password):
+    try:
+        registro = _buscar_usuario(nombre_usuario)
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+    if not registro or not verificar_clave(password, registro['clave']):
+        return None
+
+    if not registro['clave'].startswith(PREFIJO_HASH + "$"):
+        _actualizar_hash(registro['id'], password)
+
+    return {'id': registro['id'], 'nombre_usuario': registro['nombre_usuario'], 'rol': registro['rol']}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SESIONES
+# Al entrar se emite un token aleatorio opaco; la base guarda solo su sha256,
+# el usuario y el vencimiento. El token no lleva datos: el rol se lee de
+# usuarios cada vez que se restaura, y cerrar sesión borra la fila, así que
+# el logout vale para todos los procesos y sobrevive a un reinicio.
+# Las sesiones restauradas quedan en caché AUTH_SESION_CACHE_SEG segundos: un
+# logout hecho en otro proceso tarda a lo sumo eso en notarse aquí.
+#   AUTH_TOKEN_HORAS     → vigencia de la sesión
+# app.py guarda el token en una cookie (nunca en la URL).
+# ─────────────────────────────────────────────────────────────────────────────
+
+VIGENCIA_TOKEN = float(os.getenv("AUTH_TOKEN_HORAS", 12)) * 3600
+
+DDL_SESIONES = """
+    CREATE TABLE IF NOT EXISTS sesiones (
+        hash        CHAR(64) NOT NULL,
+        id_usuario  INT NOT NULL,
+        creada      DATETIME NOT NULL,
+        vence       DATETIME NOT NULL,
+        PRIMARY KEY (hash),
+        KEY idx_sesiones_vence (vence)
+    )
+"""
+
+cache_tokens = CacheTTL(max_entradas=4096, ttl=float(os.getenv("AUTH_SESION_CACHE_SEG", 30)))
+
+
+def crear_tabla_sesiones(cursor):
+    cursor.execute(DDL_SESIONES)
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def emitir_token(usuario):
+    """Registra una sesión para `usuario` y devuelve su token (None si no hay base)."""
+    from src.database import get_connection
+    token = secrets.token_urlsafe(32)
+    ahora = datetime.now()
     conn = get_connection()
-    if conn:
-        try:
-            cursor = conn.cursor(dictionary=True)
-            query = "SELECT id, nombre_usuario, rol FROM usuarios WHERE nombre_usuario = %s AND clave = %s"
-            cursor.execute(query, (nombre_usuario, password))
-            usuario = cursor.fetchone()
-            return usuario
-        except Exception as e:
-            print(f"Error: {e}")
-            return None
-        finally:
-            conn.close()
-    return None
\ No newline at end of file
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        # De paso se limpian las vencidas (índice por vence)
+        cursor.execute("DELETE FROM sesiones WHERE vence < %s", (ahora,))
+        cursor.execute(
+            "INSERT INTO sesiones (hash, id_usuario, creada, vence) VALUES (%s, %s, %s, %s)",
+            (_hash_token(token), usuario['id'], ahora, ahora + timedelta(seconds=VIGENCIA_TOKEN))
+        )
+        conn.commit()
+        return token
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def _buscar_sesion(token):
+    from src.database import get_connection
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("No hay conexión a la base de datos.")
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT u.id, u.nombre_usuario, u.rol, s.vence
+            FROM sesiones s
+            INNER JOIN usuarios u ON u.id = s.id_usuario
+            WHERE s.hash = %s
+        """, (_hash_token(token),))
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def restaurar_sesion(token):
+    """Usuario de la sesión si existe y no venció; None si no."""
+    if not token:
+        return None
+    try:
+        datos = cache_tokens.obtener(token, lambda: _buscar_sesion(token))
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+    if not datos or datos['vence'] < datetime.now():
+        return None
+    return {'id': datos['id'], 'nombre_usuario': datos['nombre_usuario'], 'rol': datos['rol']}
+
+
+def cerrar_sesion(token):
+    if not token:
+        return
+    cache_tokens.invalidar(token)
+    from src.database import get_connection
+    conn = get_connection()
+    if not conn:
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM sesiones WHERE hash = %s", (_hash_token(token),))
+        conn.commit()
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        conn.close()
+
+
+# Alta o cambio de clave: python -m src.auth <usuario> <clave>
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 3:
+        raise SystemExit("Uso: python -m src.auth <usuario> <clave>")
+    usuario = _buscar_usuario(sys.argv[1])
+    if not usuario:
+        raise SystemExit(f"No existe el usuario {sys.argv[1]}")
+    _actualizar_hash(usuario['id'], sys.argv[2])
+    print("Clave actualizada.")
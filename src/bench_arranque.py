@@ -0,0 +1,84 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# ─────────────────────────────────────────────────────────────────────────────
+# BENCHMARK DE ARRANQUE
+# Importa cada módulo en un intérprete nuevo con `python -X importtime` (sin
+# cachés de sys.modules) varias veces y reporta la mediana del tiempo
+# acumulado. También muestra qué dependencias pesan más en cada ruta.
+#
+#   python -m src.bench_arranque                 → módulos por defecto, 5 corridas
+#   python -m src.bench_arranque -n 10 pandas src.personal
+# ─────────────────────────────────────────────────────────────────────────────
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Lo que carga cada etapa: login, pantalla del operario, pantalla del supervisor
+MODULOS_DEFECTO = [
+    'streamlit',
+    'src.auth',
+    'src.database',
+    'mysql.connector',
+    'pandas',
+    'numpy',
+    'openpyxl',
+    'src.personal',
+    'src.supervisor',
+]
+
+_LINEA = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def medir(modulo):
+    """{módulo: (propio_us, acumulado_us)} de una importación en frío de `modulo`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    tiempos = {}
+    for linea in proc.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if m:
+            tiempos[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return tiempos
+
+
+def correr(modulos, repeticiones, top):
+    print(f"{'módulo':<20} {'mediana ms':>11} {'mín ms':>9} {'máx ms':>9}")
+    for modulo in modulos:
+        try:
+            corridas = [medir(modulo) for _ in range(repeticiones)]
+        except RuntimeError as e:
+            print(f"{modulo:<20} no se pudo importar: {e}")
+            continue
+        acumulados = [c[modulo][1] / 1000 for c in corridas if modulo in c]
+        if not acumulados:
+            # Mal escrito (importtime lo registra con su nombre real) o ya cargado por el intérprete
+            print(f"{modulo:<20} no aparece en -X importtime")
+            continue
+        print(f"{modulo:<20} {statistics.median(acumulados):>11.1f} "
+              f"{min(acumulados):>9.1f} {max(acumulados):>9.1f}")
+
+        if top:
+            propios = {}
+            for c in corridas:
+                for nombre, (propio, _) in c.items():
+                    propios.setdefault(nombre, []).append(propio)
+            pesados = sorted(propios.items(), key=lambda kv: statistics.median(kv[1]), reverse=True)[:top]
+            for nombre, valores in pesados:
+                print(f"    {nombre:<40} {statistics.median(valores) / 1000:>8.1f} ms propios")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de importación por módulo")
+    parser.add_argument("modulos", nargs="*", default=MODULOS_DEFECTO)
+    parser.add_argument("-n", "--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="mostrar las N dependencias más lentas de cada módulo")
+    args = parser.parse_args()
+    correr(args.modulos, args.repeticiones, args.top)
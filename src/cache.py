@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CACHÉ EN MEMORIA DEL PROCESO
+# Compartida por todas las sesiones de Streamlit (el módulo vive en
+# sys.modules). Cada entrada vence a los `ttl` segundos y, si se supera
+# `max_entradas`, se descarta la menos usada recientemente.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+class CacheTTL:
+    def __init__(self, max_entradas=256, ttl=300.0):
+        self.max_entradas = max(int(max_entradas), 1)
+        self.ttl = float(ttl)
+        self._datos = OrderedDict()   # clave → (vence, valor)
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self._stats = {'hits': 0, 'misses': 0, 'expiradas': 0, 'desalojadas': 0, 'invalidaciones': 0}
+
+    def obtener(self, clave, cargar, ttl=None):
+        """Valor de `clave`; si no está o venció, se llama `cargar()` y se guarda."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                if entrada[0] > ahora:
+                    self._datos.move_to_end(clave)
+                    self._stats['hits'] += 1
+                    return entrada[1]
+                del self._datos[clave]
+                self._stats['expiradas'] += 1
+            self._stats['misses'] += 1
+            generacion = self._generacion
+
+        valor = cargar()
+
+        with self._lock:
+            # Si alguien invalidó mientras cargábamos, el valor ya puede estar viejo
+            if generacion == self._generacion:
+                self._guardar(clave, valor, ttl)
+        return valor
+
+    def poner(self, clave, valor, ttl=None):
+        with self._lock:
+            self._guardar(clave, valor, ttl)
+
+    def _guardar(self, clave, valor, ttl):
+        vence = time.monotonic() + (self.ttl if ttl is None else float(ttl))
+        self._datos[clave] = (vence, valor)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_entradas:
+            self._datos.popitem(last=False)
+            self._stats['desalojadas'] += 1
+
+    def invalidar(self, clave=None):
+        """Borra una clave (o todas si es None). Las claves tupla se pueden borrar por su primer elemento."""
+        with self._lock:
+            self._generacion += 1
+            self._stats['invalidaciones'] += 1
+            if clave is None:
+                self._datos.clear()
+                return
+            for k in list(self._datos):
+                if k == clave or (isinstance(k, tuple) and k and k[0] == clave):
+                    del self._datos[k]
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._stats)
+            datos['entradas'] = len(self._datos)
+        total = datos['hits'] + datos['misses']
+        datos['tasa_aciertos'] = datos['hits'] / total if total else 0.0
+        return datos
@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+import numpy as np
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MERMA Y TIEMPO PONDERADO DE UNA TANDA
+# Mismo cálculo que antes hacía finalizar_produccion orden por orden, ahora
+# sobre arreglos con todas las órdenes de la tanda a la vez.
+#
+#   area_orden      = cant_cortada × ancho_fleje
+#   suma_areas      = Σ area_orden
+#   area_plancha    = ancho_real × planchas_procesadas
+#   diff            = area_plancha - suma_areas            (puede ser negativo)
+#   merma_base_kg   = (diff × espesor × largo × 7.85) / 1_000_000
+#   porcentaje      = (area_orden × 100) / suma_areas
+#   merma_orden     = (porcentaje × merma_base_kg) / 100
+#   seg_ponderados  = tiempo_total_segundos × (porcentaje / 100)
+# ─────────────────────────────────────────────────────────────────────────────
+
+DENSIDAD_ACERO = 7.85
+
+
+def segundos_a_hhmmss(seg):
+    h, r = divmod(int(seg), 3600)
+    m, s = divmod(r, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+@dataclass
+class ResultadoTanda:
+    areas: np.ndarray
+    suma_areas: float
+    merma_base_kg: float
+    porcentajes: np.ndarray
+    mermas: np.ndarray
+    segundos_ponderados: np.ndarray
+
+    def merma(self, i):
+        """Merma de la orden i redondeada como se guarda en la base."""
+        return round(float(self.mermas[i]), 4)
+
+    def tiempo_ponderado(self, i):
+        return segundos_a_hhmmss(self.segundos_ponderados[i])
+
+
+def calcular_tanda(cant_cortada, ancho_fleje, ancho_real, planchas, espesor, largo, total_segundos):
+    """
+    `cant_cortada` y `ancho_fleje` son secuencias alineadas con una posición por
+    orden de la tanda; el resto son escalares de la tanda.
+    """
+    cant = np.asarray(cant_cortada, dtype=float)
+    ancho = np.asarray(ancho_fleje, dtype=float)
+    return repartir_tanda(cant * ancho, ancho_real, planchas, espesor, largo, total_segundos)
+
+
+def repartir_tanda(areas, ancho_real, planchas, espesor, largo, total_segundos):
+    """Igual que calcular_tanda pero con las áreas por orden ya calculadas."""
+    areas = np.asarray(areas, dtype=float)
+    suma_areas = float(areas.sum())
+
+    area_plancha = float(ancho_real) * float(planchas)
+    diff = area_plancha - suma_areas
+    merma_base_kg = (diff * float(espesor) * float(largo) * DENSIDAD_ACERO) / 1_000_000
+
+    if suma_areas > 0:
+        porcentajes = (areas * 100.0) / suma_areas
+    else:
+        porcentajes = np.zeros_like(areas)
+
+    mermas = (porcentajes * merma_base_kg) / 100.0
+    segundos = float(total_segundos) * (porcentajes / 100.0)
+
+    return ResultadoTanda(areas, suma_areas, merma_base_kg, porcentajes, mermas, segundos)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PRESUPUESTO DE ÁREA DE LA TANDA
+# Límite  = desaplancha × planchas_procesadas
+# Suma    = Σ (cant_cortada × ancho_fleje) por cada orden
+# Guarda el área de cada orden y el total acumulado, así cambiar una fila y
+# calcular el ancho máximo de una fila cuestan O(1) en lugar de volver a
+# sumar todas las órdenes.
+# ─────────────────────────────────────────────────────────────────────────────
+
+class PresupuestoArea:
+    def __init__(self, limite, filas=()):
+        """`filas`: pares (cant_cortada, ancho_fleje) en el orden de las órdenes."""
+        self.limite = limite
+        self._areas = [c * a for c, a in filas]
+        self.total = sum(self._areas)
+
+    def __len__(self):
+        return len(self._areas)
+
+    @property
+    def areas(self):
+        return self._areas
+
+    @property
+    def restante(self):
+        return self.limite - self.total
+
+    @property
+    def excedido(self):
+        return self.total > self.limite
+
+    def area(self, i):
+        return self._areas[i]
+
+    def copiar(self):
+        otro = PresupuestoArea(self.limite)
+        otro._areas = list(self._areas)
+        otro.total = self.total
+        return otro
+
+    def actualizar(self, i, cant, ancho):
+        nueva = cant * ancho
+        self.total += nueva - self._areas[i]
+        self._areas[i] = nueva
+
+    def agregar(self, cant=0, ancho=0):
+        self._areas.append(cant * ancho)
+        self.total += self._areas[-1]
+
+    def quitar(self, i):
+        self.total -= self._areas.pop(i)
+
+    def area_disponible(self, i):
+        """Área que le queda a la orden i = límite - suma de áreas de las otras órdenes."""
+        return max(self.limite - (self.total - self._areas[i]), 0)
+
+    def max_ancho(self, i, cant):
+        """Ancho máximo permitido para la orden i si corta `cant` flejes."""
+        if cant > 0:
+            return int(self.area_disponible(i) // cant)
+        return 0
@@ -1,20 +1,610 @@
-import mysql.connector
+import contextvars
 import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from dotenv import load_dotenv
+from src.utils import mysql_a_sqlite, sentencia, parametros, partir_en_bloques
+from src import metricas
 
 # Cargamos las variables del archivo .env
 load_dotenv()
 
-def get_connection():
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            database=os.getenv("DB_NAME")
+# ─────────────────────────────────────────────────────────────────────────────
+# POOL DE CONEXIONES (uno por proceso)
+# Streamlit re-ejecuta los scripts en cada interacción, pero este módulo queda
+# en sys.modules, así que el pool sobrevive entre reruns y entre sesiones.
+#   DB_POOL_SIZE      → máximo de conexiones abiertas a la vez
+#   DB_POOL_TIMEOUT   → segundos a esperar por una conexión libre
+#   DB_POOL_PING_SEG  → si una conexión estuvo inactiva más que esto, se
+#                       verifica con ping antes de entregarla (0 = siempre)
+# Cada conexión guarda sus sentencias preparadas (ConexionPool.ejecutar, con
+# el registro de src/utils.py) hasta que se cierra.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+class PoolAgotadoError(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera."""
+
+
+class EscrituraEnReplicaError(Exception):
+    """Se intentó escribir (o hacer commit) con una conexión de la réplica."""
+
+
+def _config_conexion(prefijo="DB_"):
+    """prefijo="DB_REPLICA_": lo que no esté definido para la réplica se toma del primario."""
+    def var(nombre):
+        return os.getenv(prefijo + nombre) or os.getenv("DB_" + nombre)
+
+    config = {
+        'host': var("HOST"),
+        'user': var("USER"),
+        'password': var("PASS"),
+        'database': var("NAME"),
+    }
+    if var("PORT"):
+        config['port'] = int(var("PORT"))
+    return config
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MOTORES
+#   DB_MOTOR        → mysql (por defecto) o sqlite
+#   DB_SQLITE_RUTA  → archivo de la base embebida (":memory:" = en memoria,
+#                     compartida por todas las conexiones del proceso)
+# En modo SQLite la base se crea con las migraciones al abrir el pool, así la
+# app y los benchmarks corren sin servidor. Las conexiones SQLite imitan la
+# parte de mysql.connector que usa el proyecto (cursor(dictionary=True),
+# %s, rowcount, lastrowid, in_transaction, ping) y traducen el SQL con
+# src.utils.mysql_a_sqlite.
+# ─────────────────────────────────────────────────────────────────────────────
+
+def motor_configurado():
+    return os.getenv("DB_MOTOR", "mysql").strip().lower()
+
+
+def es_sqlite():
+    return motor_configurado() == "sqlite"
+
+
+class MotorMySQL:
+    nombre = "mysql"
+
+    def __init__(self, **config):
+        import mysql.connector  # solo se carga si el motor es MySQL
+        self._conector = mysql.connector
+        self.Error = mysql.connector.Error
+        self.OperationalError = mysql.connector.errors.OperationalError
+        self._config = config
+
+    def conectar(self):
+        return self._conector.connect(**self._config)
+
+    def cursor_preparado(self, conn):
+        return conn.cursor(prepared=True)
+
+
+# Tipos de columna → tipos de Python, como los entrega mysql.connector
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(timedelta, lambda v: _segundos_a_time(v.total_seconds()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+sqlite3.register_converter("TIME", lambda b: _time_a_timedelta(b.decode()))
+
+
+def _segundos_a_time(seg):
+    h, r = divmod(int(seg), 3600)
+    m, s = divmod(r, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+def _time_a_timedelta(texto):
+    h, m, s = texto.split(":")
+    return timedelta(hours=int(h), minutes=int(m), seconds=float(s))
+
+
+class CursorSQLite:
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(mysql_a_sqlite(sql), tuple(params or ()))
+        return self
+
+    def executemany(self, sql, filas):
+        self._cursor.executemany(mysql_a_sqlite(sql), [tuple(f) for f in filas])
+        return self
+
+    def _fila(self, fila):
+        if fila is None or not self._dictionary:
+            return fila
+        return dict(zip((d[0] for d in self._cursor.description), fila))
+
+    def fetchone(self):
+        return self._fila(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._fila(f) for f in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._fila(f) for f in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._fila(f) for f in self._cursor)
+
+
+class ConexionSQLite:
+    def __init__(self, ruta, uri=False):
+        self._conn = sqlite3.connect(
+            ruta, uri=uri, timeout=30, check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES
         )
-        return connection
-    except mysql.connector.Error as err:
+        self._conn.execute("PRAGMA journal_mode = WAL")
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def cursor(self, dictionary=False, **_):
+        return CursorSQLite(self._conn.cursor(), dictionary)
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class MotorSQLite:
+    nombre = "sqlite"
+    Error = sqlite3.Error
+    OperationalError = sqlite3.OperationalError
+
+    def __init__(self, ruta):
+        self._uri = ruta == ":memory:"
+        # Una base en memoria vive mientras quede una conexión abierta a ella
+        self.ruta = "file:planta_memoria?mode=memory&cache=shared" if self._uri else ruta
+        self._ancla = ConexionSQLite(self.ruta, self._uri) if self._uri else None
+
+    def conectar(self):
+        return ConexionSQLite(self.ruta, self._uri)
+
+    def cursor_preparado(self, conn):
+        # sqlite3 ya guarda compiladas las últimas sentencias de cada conexión
+        return conn.cursor()
+
+
+def crear_motor():
+    if es_sqlite():
+        return MotorSQLite(os.getenv("DB_SQLITE_RUTA", "planta.db"))
+    return MotorMySQL(**_config_conexion())
+
+
+class CursorSoloLectura:
+    """Cursor de una conexión de la réplica: solo deja pasar consultas."""
+
+    PERMITIDAS = ('SELECT', 'WITH', 'SHOW', 'EXPLAIN', 'DESCRIBE')
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def _verificar(self, sql):
+        palabra = (sql.lstrip(" \t\r\n(").split(None, 1) or [""])[0].upper()
+        if palabra not in self.PERMITIDAS:
+            raise EscrituraEnReplicaError(
+                f"{palabra or 'Sentencia vacía'} con una conexión de solo lectura (réplica)."
+            )
+
+    def execute(self, sql, params=()):
+        self._verificar(sql)
+        return self._cursor.execute(sql, params)
+
+    def executemany(self, sql, filas):
+        self._verificar(sql)
+        return self._cursor.executemany(sql, filas)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class ConexionPool:
+    """
+    Envoltura de una conexión prestada por el pool.
+    Se usa igual que la conexión de mysql.connector; close() la devuelve al
+    pool en lugar de cerrarla. También sirve como context manager:
+
+        with get_connection() as conn:
+            ...
+    """
+
+    def __init__(self, pool, conn, solo_lectura=False):
+        self._pool = pool
+        self._conn = conn
+        self.solo_lectura = solo_lectura
+
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise self._pool.motor.OperationalError("La conexión ya fue devuelta al pool.")
+        return getattr(self._conn, nombre)
+
+    def _rechazar_en_replica(self, que):
+        if self.solo_lectura:
+            raise EscrituraEnReplicaError(
+                f"{que} con una conexión de solo lectura (réplica); pedir get_connection() para escribir."
+            )
+
+    def cursor(self, *args, **kwargs):
+        """Cursor medido (src/metricas.py): duración, filas y función de cada sentencia."""
+        cursor = metricas.envolver(self.__getattr__('cursor')(*args, **kwargs))
+        return CursorSoloLectura(cursor) if self.solo_lectura else cursor
+
+    def ejecutar(self, nombre, params=(), filas=None):
+        """
+        Sentencia registrada `nombre` (src/utils.py), preparada una vez por
+        conexión y reutilizada. Devuelve el cursor.
+        """
+        if self._conn is None:
+            raise self._pool.motor.OperationalError("La conexión ya fue devuelta al pool.")
+        self._rechazar_en_replica(f"Sentencia '{nombre}'")
+        cursor = metricas.envolver(self._pool.cursor_preparado(self._conn, nombre, filas))
+        cursor.execute(sentencia(nombre, filas), params)
+        return cursor
+
+    def ejecutar_filas(self, nombre, filas, comunes=()):
+        """Sentencia registrada de varias filas, por bloques. Devuelve las filas afectadas."""
+        afectadas = 0
+        for bloque in partir_en_bloques(list(filas)):
+            cursor = self.ejecutar(nombre, parametros(nombre, comunes, bloque), len(bloque))
+            afectadas += max(cursor.rowcount, 0)
+        return afectadas
+
+    def commit(self):
+        self._rechazar_en_replica("commit()")
+        self.__getattr__('commit')()
+        _marcar_escritura()
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb):
+        if tipo_exc is not None and self._conn is not None:
+            try:
+                self._conn.rollback()
+            except self._pool.motor.Error:
+                pass
+        self.close()
+        return False
+
+
+class PoolConexiones:
+    def __init__(self, tamano=10, timeout=10.0, ping_seg=30.0, motor=None, **config):
+        self.tamano = max(int(tamano), 1)
+        self.timeout = float(timeout)
+        self.ping_seg = float(ping_seg)
+        self.motor = motor or MotorMySQL(**config)
+        self._libres = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._creadas = 0
+        self._preparados = {}   # conexión → {(nombre, filas): cursor preparado}
+        self._stats = {
+            'checkouts': 0,
+            'esperas': 0,
+            'timeouts': 0,
+            'resets': 0,
+            'creadas': 0,
+            'preparadas': 0,
+        }
+
+    def _sumar(self, clave, n=1):
+        with self._lock:
+            self._stats[clave] += n
+
+    def _conectar(self):
+        conn = self.motor.conectar()
+        self._sumar('creadas')
+        return conn
+
+    def cursor_preparado(self, conn, nombre, filas=None):
+        """Cursor con la sentencia ya preparada en `conn`; se crea la primera vez."""
+        with self._lock:
+            cursores = self._preparados.setdefault(conn, {})
+        cursor = cursores.get((nombre, filas))
+        if cursor is None:
+            cursor = cursores[(nombre, filas)] = self.motor.cursor_preparado(conn)
+            self._sumar('preparadas')
+        return cursor
+
+    def _cerrar_conexion(self, conn):
+        """Cierra la conexión real; sus sentencias preparadas se van con ella."""
+        with self._lock:
+            self._preparados.pop(conn, None)
+        try:
+            conn.close()
+        except self.motor.Error:
+            pass
+
+    def _reservar_cupo(self):
+        with self._lock:
+            if self._creadas < self.tamano:
+                self._creadas += 1
+                return True
+        return False
+
+    def _liberar_cupo(self):
+        with self._lock:
+            self._creadas -= 1
+
+    def _verificar(self, conn, inactiva_desde):
+        """Pre-ping: si la conexión se cayó (wait_timeout, reinicio del servidor) se reemplaza."""
+        if time.monotonic() - inactiva_desde < self.ping_seg:
+            return conn
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except self.motor.Error:
+            self._sumar('resets')
+            self._cerrar_conexion(conn)
+            return self._conectar()
+
+    def obtener(self, timeout=None, solo_lectura=False):
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            conn, inactiva_desde = self._libres.get_nowait()
+        except queue.Empty:
+            if self._reservar_cupo():
+                try:
+                    conn = self._conectar()
+                except Exception:
+                    self._liberar_cupo()
+                    raise
+                self._sumar('checkouts')
+                return ConexionPool(self, conn, solo_lectura)
+
+            # Pool lleno: esperamos a que otra sesión devuelva una conexión
+            self._sumar('esperas')
+            try:
+                conn, inactiva_desde = self._libres.get(timeout=timeout)
+            except queue.Empty:
+                self._sumar('timeouts')
+                raise PoolAgotadoError(
+                    f"Sin conexiones libres tras {timeout:.1f}s (tamaño del pool: {self.tamano})"
+                )
+
+        try:
+            conn = self._verificar(conn, inactiva_desde)
+        except Exception:
+            self._liberar_cupo()
+            raise
+        self._sumar('checkouts')
+        return ConexionPool(self, conn, solo_lectura)
+
+    def devolver(self, conn):
+        # Una transacción que quedó abierta no debe filtrarse al siguiente usuario
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except self.motor.Error:
+            self._cerrar_conexion(conn)
+            self._liberar_cupo()
+            return
+        self._libres.put((conn, time.monotonic()))
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self._stats)
+            datos['abiertas'] = self._creadas
+        datos['libres'] = self._libres.qsize()
+        datos['en_uso'] = datos['abiertas'] - datos['libres']
+        datos['tamano'] = self.tamano
+        return datos
+
+    def cerrar_todo(self):
+        while True:
+            try:
+                conn, _ = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._cerrar_conexion(conn)
+            self._liberar_cupo()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = PoolConexiones(
+                    tamano=os.getenv("DB_POOL_SIZE", 10),
+                    timeout=os.getenv("DB_POOL_TIMEOUT", 10),
+                    ping_seg=os.getenv("DB_POOL_PING_SEG", 30),
+                    motor=crear_motor()
+                )
+                if pool.motor.nombre == "sqlite":
+                    _sembrar_sqlite(pool)
+                _pool = pool
+    return _pool
+
+
+@metricas.en_pagina('arranque')
+def _sembrar_sqlite(pool):
+    """
+    Esquema completo vía migraciones y, si la base está vacía, un usuario por
+    rol con la clave DB_SQLITE_CLAVE_INICIAL (por defecto "cambiar").
+    """
+    from src import migraciones, auth
+    conn = pool.obtener()
+    try:
+        migraciones.aplicar(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM usuarios")
+        if cursor.fetchone()[0] == 0:
+            clave = auth.hashear_clave(os.getenv("DB_SQLITE_CLAVE_INICIAL", "cambiar"))
+            cursor.executemany(
+                "INSERT INTO usuarios (nombre_usuario, clave, rol) VALUES (%s, %s, %s)",
+                [("supervisor", clave, "supervisor"), ("operario", clave, "personal")]
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RÉPLICA DE LECTURA (solo MySQL)
+#   DB_REPLICA_HOST         → réplica; sin definir, todo va al primario
+#   DB_REPLICA_PORT / _USER / _PASS / _NAME → si faltan, los del primario
+#   DB_REPLICA_POOL_SIZE    → tamaño de su pool (por defecto DB_POOL_SIZE)
+#   DB_REPLICA_VENTANA_SEG  → después de que una sesión hace commit, sus
+#                             lecturas van al primario durante estos segundos
+#                             (ve lo que escribió aunque la réplica esté atrasada)
+#   DB_REPLICA_REINTENTO_SEG → si la réplica falla, cuánto tiempo se deja de
+#                             intentar antes de volver a probarla
+#
+# get_connection(solo_lectura=True) pide la réplica y, si no hay, está caída
+# o su pool se agotó, entrega una del primario. La sesión es la que abrió
+# en_sesion() en este hilo (app.py la abre en cada rerun con st.session_state).
+#
+#   python -m src.prueba_replica   (dos instancias MySQL locales)
+# ─────────────────────────────────────────────────────────────────────────────
+
+VENTANA_LECTURA_SEG = float(os.getenv("DB_REPLICA_VENTANA_SEG", 5))
+REINTENTO_REPLICA_SEG = float(os.getenv("DB_REPLICA_REINTENTO_SEG", 30))
+CLAVE_ESCRITURA = '_db_ultima_escritura'
+
+_sesion = contextvars.ContextVar('sesion_db', default=None)
+_pool_replica = None
+_replica_caida_hasta = 0.0
+_ruteo_lock = threading.Lock()
+_ruteo = {'replica': 0, 'primario_por_escritura': 0, 'primario_por_falla': 0}
+
+
+@contextmanager
+def en_sesion(estado):
+    """`estado`: dict de la sesión (st.session_state) donde se anota el último commit."""
+    token = _sesion.set(estado)
+    try:
+        yield
+    finally:
+        _sesion.reset(token)
+
+
+def _marcar_escritura():
+    estado = _sesion.get()
+    if estado is not None:
+        estado[CLAVE_ESCRITURA] = time.monotonic()
+
+
+def escribio_hace_poco():
+    estado = _sesion.get()
+    if estado is None:
+        return False
+    ultima = estado.get(CLAVE_ESCRITURA)
+    return ultima is not None and time.monotonic() - ultima < VENTANA_LECTURA_SEG
+
+
+def replica_configurada():
+    return bool(os.getenv("DB_REPLICA_HOST")) and not es_sqlite()
+
+
+def obtener_pool_replica():
+    """Pool de la réplica, o None si no hay réplica configurada."""
+    global _pool_replica
+    if _pool_replica is None and replica_configurada():
+        with _pool_lock:
+            if _pool_replica is None:
+                _pool_replica = PoolConexiones(
+                    tamano=os.getenv("DB_REPLICA_POOL_SIZE") or os.getenv("DB_POOL_SIZE", 10),
+                    timeout=os.getenv("DB_POOL_TIMEOUT", 10),
+                    ping_seg=os.getenv("DB_POOL_PING_SEG", 30),
+                    motor=MotorMySQL(**_config_conexion("DB_REPLICA_"))
+                )
+    return _pool_replica
+
+
+def _sumar_ruteo(clave):
+    with _ruteo_lock:
+        _ruteo[clave] += 1
+
+
+def _conexion_replica(timeout):
+    """Conexión de la réplica, o None si hay que ir al primario."""
+    global _replica_caida_hasta
+    pool = obtener_pool_replica()
+    if pool is None:
+        return None
+    if escribio_hace_poco():
+        _sumar_ruteo('primario_por_escritura')
+        return None
+    if time.monotonic() < _replica_caida_hasta:
+        _sumar_ruteo('primario_por_falla')
+        return None
+    try:
+        conn = pool.obtener(timeout=timeout, solo_lectura=True)
+    except pool.motor.Error as err:
+        print(f"Réplica no disponible, se usa el primario: {err}")
+        _replica_caida_hasta = time.monotonic() + REINTENTO_REPLICA_SEG
+        _sumar_ruteo('primario_por_falla')
+        return None
+    except PoolAgotadoError:
+        _sumar_ruteo('primario_por_falla')
+        return None
+    _sumar_ruteo('replica')
+    return conn
+
+
+def estadisticas_pool():
+    datos = obtener_pool().estadisticas()
+    if _pool_replica is not None:
+        datos['replica'] = _pool_replica.estadisticas()
+    if replica_configurada():
+        with _ruteo_lock:
+            datos['lecturas'] = dict(_ruteo)
+    return datos
+
+
+def get_connection(timeout=None, solo_lectura=False):
+    """
+    solo_lectura=True: la conexión puede venir de la réplica. Usarla solo para
+    SELECT: si vino de la réplica, commit() y las sentencias que no sean
+    consultas lanzan EscrituraEnReplicaError.
+    """
+    if solo_lectura:
+        conn = _conexion_replica(timeout)
+        if conn is not None:
+            return conn
+    pool = obtener_pool()
+    try:
+        return pool.obtener(timeout=timeout)
+    except pool.motor.Error as err:
+        print(f"Error de conexión: {err}")
+        return None
+    except PoolAgotadoError as err:
         print(f"Error de conexión: {err}")
         return None
 
@@ -22,5 +612,6 @@ def get_connection():
 if __name__ == "__main__":
     conn = get_connection()
     if conn:
-        print("¡Conexión exitosa a MySQL!")
-        conn.close()
\ No newline at end of file
+        print(f"¡Conexión exitosa ({obtener_pool().motor.nombre})!")
+        conn.close()
+        print(estadisticas_pool())
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from src.database import get_connection
+
+# ─────────────────────────────────────────────────────────────────────────────
+# EXPORTACIÓN DE PRODUCCIÓN
+# Las filas se leen con un cursor sin buffer (el resultado queda en el
+# servidor y llega a medida que se pide) en bloques de fetchmany, y se van
+# escribiendo al CSV o al XLSX (openpyxl en modo write_only). En memoria solo
+# hay un bloque a la vez, sin importar cuántas filas entren en el rango.
+#   EXPORTACION_BLOQUE → filas por fetchmany
+#   EXPORTACION_MAX_MB → tope del archivo que se descarga desde la pantalla
+#
+# Streamlit sirve el botón de descarga desde memoria (lee el archivo entero),
+# así que la pantalla solo entrega exportaciones de hasta EXPORTACION_MAX_MB.
+# Para rangos más grandes está la línea de comandos, que escribe directo al
+# archivo de salida con memoria constante:
+#
+#   python -m src.exportacion produccion --desde 2026-01-01 --hasta 2026-01-31 \
+#       [--lote 4019635] [--formato csv|xlsx] --salida archivo
+# ─────────────────────────────────────────────────────────────────────────────
+
+TAMANO_BLOQUE = int(os.getenv("EXPORTACION_BLOQUE", 2000))
+MAX_MB_DESCARGA = float(os.getenv("EXPORTACION_MAX_MB", 50))
+
+
+class ExportacionGrandeError(Exception):
+    """La exportación pasa el tope de descarga desde la pantalla."""
+
+# Filtro por rango de hora_inicio y, opcionalmente, lote_padre
+CONSULTAS = {
+    'produccion': """
+        SELECT p.*
+        FROM produccion p
+        {union_lote}
+        WHERE p.hora_inicio >= %s AND p.hora_inicio < %s {filtro_lote}
+        ORDER BY p.hora_inicio, p.id_registro
+    """,
+    'detalles_produccion': """
+        SELECT d.*, p.hora_inicio, p.hora_fin, p.maquina_real, p.operador
+        FROM detalles_produccion d
+        INNER JOIN produccion p ON p.id_registro = d.id_registro_produccion
+        {union_lote}
+        WHERE p.hora_inicio >= %s AND p.hora_inicio < %s {filtro_lote}
+        ORDER BY p.hora_inicio, d.id_detalle
+    """,
+}
+
+
+def _consulta(tabla, desde, hasta, lote_padre=None):
+    params = [datetime.combine(desde, time.min), datetime.combine(hasta + timedelta(days=1), time.min)]
+    union_lote = filtro_lote = ""
+    if lote_padre:
+        union_lote = "INNER JOIN ordenes o ON o.lote_completo = p.lote_referencia"
+        filtro_lote = "AND o.lote_padre = %s"
+        params.append(lote_padre)
+    return CONSULTAS[tabla].format(union_lote=union_lote, filtro_lote=filtro_lote), params
+
+
+def leer_bloques(conn, tabla, desde, hasta, lote_padre=None, tam_bloque=TAMANO_BLOQUE):
+    """Genera (columnas, filas) de a `tam_bloque`. El cursor no trae todo el resultado de una vez."""
+    query, params = _consulta(tabla, desde, hasta, lote_padre)
+    cursor = conn.cursor(buffered=False)
+    agotado = False
+    try:
+        cursor.execute(query, params)
+        columnas = [d[0] for d in cursor.description]
+        while True:
+            filas = cursor.fetchmany(tam_bloque)
+            if not filas:
+                agotado = True
+                break
+            yield columnas, filas
+    finally:
+        # Si se cortó a mitad, el resto del resultado sigue en la conexión y
+        # la dejaría inutilizable para el próximo que la tome del pool
+        if not agotado and hasattr(conn, 'consume_results'):
+            conn.consume_results()
+        cursor.close()
+
+
+def _valor_csv(v):
+    if isinstance(v, timedelta):
+        seg = int(v.total_seconds())
+        return f"{seg // 3600:02d}:{seg % 3600 // 60:02d}:{seg % 60:02d}"
+    return "" if v is None else v
+
+
+def escribir_csv(salida, bloques):
+    """`salida`: archivo binario abierto. Devuelve las filas escritas."""
+    texto = io.TextIOWrapper(salida, encoding="utf-8-sig", newline="")
+    escritor = csv.writer(texto)
+    total = 0
+    encabezado = False
+    for columnas, filas in bloques:
+        if not encabezado:
+            escritor.writerow(columnas)
+            encabezado = True
+        escritor.writerows([_valor_csv(v) for v in f] for f in filas)
+        total += len(filas)
+    texto.flush()
+    texto.detach()  # el archivo sigue abierto para quien llamó
+    return total
+
+
+def escribir_xlsx(salida, bloques, hoja="produccion"):
+    """openpyxl write_only: cada fila se vuelca a disco al agregarla."""
+    from openpyxl import Workbook
+    libro = Workbook(write_only=True)
+    ws = libro.create_sheet(hoja)
+    total = 0
+    encabezado = False
+    for columnas, filas in bloques:
+        if not encabezado:
+            ws.append(columnas)
+            encabezado = True
+        for f in filas:
+            ws.append(list(f))
+        total += len(filas)
+    libro.save(salida)
+    return total
+
+
+def exportar(conn, tabla, desde, hasta, lote_padre=None, formato="csv", salida=None):
+    """
+    Escribe la exportación en `salida` (archivo binario) o en un archivo
+    temporal anónimo. Devuelve (archivo posicionado al inicio, filas).
+    """
+    salida = salida or tempfile.TemporaryFile()
+    bloques = leer_bloques(conn, tabla, desde, hasta, lote_padre)
+    if formato == "xlsx":
+        filas = escribir_xlsx(salida, bloques, hoja=tabla[:31])
+    else:
+        filas = escribir_csv(salida, bloques)
+    salida.seek(0)
+    return salida, filas
+
+
+def exportar_para_descarga(conn, tabla, desde, hasta, lote_padre=None, formato="csv",
+                           max_mb=MAX_MB_DESCARGA):
+    """
+    Contenido de la exportación para st.download_button. Se arma en un
+    temporal que se cierra (y se borra) antes de volver; si pasa de `max_mb`
+    no se lee a memoria y se lanza ExportacionGrandeError.
+    """
+    archivo, filas = exportar(conn, tabla, desde, hasta, lote_padre, formato)
+    with archivo:
+        tamano = os.fstat(archivo.fileno()).st_size
+        if tamano > max_mb * 1024 * 1024:
+            raise ExportacionGrandeError(
+                f"La exportación ocupa {tamano / 1024 / 1024:.0f} MB ({filas} filas), más que el "
+                f"tope de {max_mb:.0f} MB para descargar desde la pantalla. Acote el rango o use "
+                f"python -m src.exportacion {tabla} --desde {desde} --hasta {hasta} --salida archivo"
+            )
+        return archivo.read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportación de producción por rango de fechas")
+    parser.add_argument("tabla", choices=list(CONSULTAS))
+    parser.add_argument("--desde", type=date.fromisoformat, required=True)
+    parser.add_argument("--hasta", type=date.fromisoformat, required=True)
+    parser.add_argument("--lote", help="lote_padre")
+    parser.add_argument("--formato", choices=["csv", "xlsx"], default="csv")
+    parser.add_argument("--salida", required=True)
+    args = parser.parse_args()
+
+    conn = get_connection(solo_lectura=True)
+    if not conn:
+        raise SystemExit(1)
+    try:
+        with open(args.salida, "wb") as archivo:
+            _, filas = exportar(conn, args.tabla, args.desde, args.hasta, args.lote, args.formato, archivo)
+        print(f"{filas} filas exportadas a {args.salida}")
+    finally:
+        conn.close()
@@ -0,0 +1,533 @@
+import hashlib
+import math
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from xml.etree import ElementTree
+from src import saldo_lote
+from src.utils import COLUMNAS_UPSERT_ORDENES, COLUMNAS_ACTUALIZABLES_ORDENES
+
+# ─────────────────────────────────────────────────────────────────────────────
+# INGESTA DE PLANES DE PRODUCCIÓN
+# Lectura del Excel por bloques y upsert masivo en ordenes. No depende de
+# Streamlit: la usan tanto la pantalla del supervisor como los trabajos en
+# segundo plano (src/trabajos.py).
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Columnas del Excel en el orden de la tabla ordenes (lote_padre se deriva de LOTE)
+COLUMNAS_EXCEL = [
+    'LOTE', 'ID MAQUINA', 'MAQUINA', 'Cant. Planchas', 'Ancho Pl.', 'Desaplancha',
+    'Espesor', 'Calidad', 'Largo', 'Desarrollo', 'Cant.', 'can.total', 'Destino',
+    'COD.FA', 'COD.SAP', 'COD.UTIL', 'COD.IBS', 'Peso Unt.', 'Peso Total', 'ORDEN',
+    'Lot. Insp.', 'COD', 'DESCRIP. SAP'
+]
+
+TAMANO_LOTE_DEFECTO = 1000
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# HUELLAS DE CONTENIDO
+# Volver a subir el último archivo cargado no lo procesa de nuevo, y de un
+# plan con pocas líneas cambiadas solo se escriben las filas nuevas o distintas:
+#   archivos_ingesta.hash → sha256 del archivo subido
+#   ordenes.hash_fila     → blake2b de las columnas que el upsert actualiza
+#                           (COLUMNAS_ACTUALIZABLES_ORDENES en src/utils.py):
+#                           un cambio en otra columna tampoco se escribiría
+# Las órdenes con hash_fila NULL (o calculado con otras columnas) se escriben
+# una vez en la próxima carga que las traiga.
+# ─────────────────────────────────────────────────────────────────────────────
+
+DDL_ARCHIVOS = """
+    CREATE TABLE IF NOT EXISTS archivos_ingesta (
+        hash      CHAR(64) NOT NULL,
+        archivo   VARCHAR(255) NOT NULL,
+        usuario   VARCHAR(50),
+        filas     INT NOT NULL DEFAULT 0,
+        cargado   DATETIME NOT NULL,
+        PRIMARY KEY (hash)
+    )
+"""
+
+
+def crear_tabla_archivos(cursor):
+    cursor.execute(DDL_ARCHIVOS)
+
+
+def hash_archivo(archivo, tam_bloque=1 << 20):
+    """sha256 del contenido; deja el archivo posicionado al inicio."""
+    h = hashlib.sha256()
+    archivo.seek(0)
+    for parte in iter(lambda: archivo.read(tam_bloque), b""):
+        h.update(parte)
+    archivo.seek(0)
+    return h.hexdigest()
+
+
+def hash_archivos(archivos):
+    """Huella de una carga de varios archivos [(nombre, archivo)]; con uno solo es hash_archivo."""
+    huellas = sorted(hash_archivo(a) for _, a in archivos)
+    if len(huellas) == 1:
+        return huellas[0]
+    return hashlib.sha256("".join(huellas).encode()).hexdigest()
+
+
+_POSICIONES_ACTUALIZABLES = [COLUMNAS_UPSERT_ORDENES.index(c) for c in COLUMNAS_ACTUALIZABLES_ORDENES]
+
+
+def _blake2b(valores):
+    texto = "\x1f".join("" if v is None else str(v) for v in valores)
+    return hashlib.blake2b(texto.encode(), digest_size=16).hexdigest()
+
+
+def hash_fila(fila):
+    """Huella de lo que el upsert escribe en una orden existente."""
+    return _blake2b([fila[i] for i in _POSICIONES_ACTUALIZABLES])
+
+
+def huella_completa(fila):
+    """Huella de la fila entera, para comparar el mismo LOTE entre hojas."""
+    return _blake2b(fila)
+
+
+def buscar_archivo(conn, huella):
+    """
+    Registro de archivos_ingesta si el último plan cargado fue este mismo
+    archivo, o None. Si después se cargó otro, la base ya no tiene estos
+    datos y hay que procesarlo de nuevo.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT hash, archivo, usuario, filas, cargado FROM archivos_ingesta
+        ORDER BY cargado DESC
+        LIMIT 1
+    """)
+    ultima = cursor.fetchone()
+    return ultima if ultima and ultima['hash'] == huella else None
+
+
+def registrar_archivo(cursor, huella, nombre_archivo, filas, usuario=None):
+    """Se llama dentro de la transacción de la carga, antes del commit."""
+    cursor.execute("""
+        INSERT INTO archivos_ingesta (hash, archivo, usuario, filas, cargado)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            archivo = VALUES(archivo), usuario = VALUES(usuario),
+            filas = VALUES(filas), cargado = VALUES(cargado)
+    """, (huella, nombre_archivo, usuario, filas))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# LECTURA DEL EXCEL
+# openpyxl en modo read_only recorre la hoja fila por fila sin cargarla
+# entera, así la memoria depende del tamaño del bloque y no del archivo.
+# ─────────────────────────────────────────────────────────────────────────────
+
+class HojaSinPlan(ValueError):
+    """La hoja no tiene columna LOTE (portada, resumen): no es parte del plan."""
+
+
+def abrir_hoja(archivo):
+    from openpyxl import load_workbook  # solo hace falta cuando hay un archivo subido
+    archivo.seek(0)
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    return libro, libro.active
+
+
+def indices_columnas(encabezado):
+    posiciones = {str(c).strip(): i for i, c in enumerate(encabezado) if c is not None}
+    if COLUMNAS_EXCEL[0] not in posiciones:
+        raise HojaSinPlan(f"La hoja no tiene la columna {COLUMNAS_EXCEL[0]}")
+    faltantes = [c for c in COLUMNAS_EXCEL if c not in posiciones]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el Excel: {', '.join(faltantes)}")
+    return [posiciones[c] for c in COLUMNAS_EXCEL]
+
+
+def bloques_desde_excel(fuente, tam_lote=TAMANO_LOTE_DEFECTO, hoja=None):
+    """
+    Entrega la hoja (la activa si no se indica) como listas de tuplas de hasta
+    `tam_lote` filas. `fuente` es una ruta o un archivo abierto.
+    """
+    from openpyxl import load_workbook
+    libro = load_workbook(_como_archivo(fuente), read_only=True, data_only=True)
+    try:
+        filas = (libro[hoja] if hoja else libro.active).iter_rows(values_only=True)
+        indices = indices_columnas(next(filas, None) or ())
+        bloque = []
+        for f in filas:
+            if f[indices[0]] is None:
+                continue  # fila vacía (sin LOTE)
+            bloque.append(normalizar_fila([f[i] for i in indices]))
+            if len(bloque) >= tam_lote:
+                yield bloque
+                bloque = []
+        if bloque:
+            yield bloque
+    finally:
+        libro.close()
+
+
+def bloques_desde_filas(filas, tam_lote=TAMANO_LOTE_DEFECTO):
+    for inicio in range(0, len(filas), tam_lote):
+        yield filas[inicio:inicio + tam_lote]
+
+
+def bloques_desde_df(df, tam_lote=TAMANO_LOTE_DEFECTO):
+    return bloques_desde_filas(construir_filas(df), tam_lote)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ARCHIVOS TEMPORALES
+# Las cargas se copian a disco por bloques antes de leerlas: los procesos del
+# pool y los trabajos en segundo plano reciben rutas, nunca el contenido.
+# ─────────────────────────────────────────────────────────────────────────────
+
+def copiar_a_temporales(archivos, sufijo=".xlsx"):
+    """[(nombre, archivo abierto)] → [(nombre, ruta)]. Se borran con borrar_temporales."""
+    rutas = []
+    try:
+        for nombre, archivo in archivos:
+            archivo.seek(0)
+            with tempfile.NamedTemporaryFile(delete=False, suffix=sufijo) as tmp:
+                rutas.append((nombre, tmp.name))
+                shutil.copyfileobj(archivo, tmp, 1 << 20)
+            archivo.seek(0)
+    except Exception:
+        borrar_temporales(rutas)
+        raise
+    return rutas
+
+
+def borrar_temporales(rutas):
+    for _, ruta in rutas:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# LECTURA EN PARALELO DE VARIOS ARCHIVOS Y HOJAS
+# Cada hoja de cada libro es una tarea para un pool de procesos (openpyxl es
+# Python puro: con hilos el GIL no deja leer dos hojas a la vez). La tarea
+# lleva la ruta del libro; el proceso deja las filas normalizadas en un
+# archivo temporal, un bloque pickle a la vez, y devuelve solo la ruta y el
+# conteo. Con una sola hoja (o INGESTA_PROCESOS=1) no hay pool: se lee el
+# libro directamente por bloques.
+#   INGESTA_PROCESOS → procesos del pool (por defecto, uno por núcleo)
+# Se usa "spawn": hacer fork del servidor de Streamlit, que tiene hilos, puede
+# dejar locks tomados en el hijo. El pool se crea una vez por proceso.
+# Las hojas sin columna LOTE (portadas, resúmenes) se ignoran.
+#
+# La validación entre hojas recorre los bloques una vez guardando solo
+# LOTE → (huella de la fila, hoja); la escritura los recorre de nuevo. Ningún paso
+# tiene el plan completo en memoria.
+# ─────────────────────────────────────────────────────────────────────────────
+
+MAX_ERRORES = 50
+
+_procesos = None
+_procesos_lock = threading.Lock()
+
+
+def _num_procesos():
+    return int(os.getenv("INGESTA_PROCESOS", 0)) or os.cpu_count() or 1
+
+
+def _pool_procesos():
+    global _procesos
+    if _procesos is None:
+        with _procesos_lock:
+            if _procesos is None:
+                _procesos = ProcessPoolExecutor(
+                    max_workers=_num_procesos(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _procesos
+
+
+def _como_archivo(fuente):
+    """Ruta o archivo abierto → algo que openpyxl/zipfile pueden abrir."""
+    if hasattr(fuente, 'seek'):
+        fuente.seek(0)
+    return fuente
+
+
+def listar_hojas(fuente):
+    """Nombres de las hojas leyendo solo xl/workbook.xml (no carga el libro)."""
+    with zipfile.ZipFile(_como_archivo(fuente)) as z:
+        raiz = ElementTree.fromstring(z.read("xl/workbook.xml"))
+    ns = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    return [h.get("name") for h in raiz.iterfind("m:sheets/m:sheet", ns)]
+
+
+def parsear_hoja(tarea):
+    """
+    Corre dentro del pool. `tarea` = (nombre_archivo, ruta, hoja). Escribe las
+    filas normalizadas en un archivo temporal por bloques y devuelve un dict
+    con su ruta (`volcado`) y la cantidad de filas, o con `error` / `ignorada`.
+    """
+    nombre_archivo, ruta, hoja = tarea
+    inicio = time.perf_counter()
+    resultado = {'archivo': nombre_archivo, 'hoja': hoja, 'ruta': ruta, 'volcado': None,
+                 'filas': 0, 'error': None, 'ignorada': False}
+    completo = False
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".filas") as volcado:
+            resultado['volcado'] = volcado.name
+            for bloque in bloques_desde_excel(ruta, TAMANO_LOTE_DEFECTO, hoja):
+                pickle.dump(bloque, volcado, pickle.HIGHEST_PROTOCOL)
+                resultado['filas'] += len(bloque)
+        completo = True
+    except HojaSinPlan:
+        resultado['ignorada'] = True
+    except ValueError as e:
+        resultado['error'] = str(e)
+    finally:
+        if resultado['volcado'] and not completo:
+            borrar_temporales([(None, resultado['volcado'])])
+            resultado['volcado'] = None
+        resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def _leer_volcado(ruta):
+    with open(ruta, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _bloques_de(resultado):
+    """Bloques de una hoja: del volcado del proceso, o del libro si se leyó aquí."""
+    if resultado['volcado']:
+        return _leer_volcado(resultado['volcado'])
+    return bloques_desde_excel(resultado['ruta'], TAMANO_LOTE_DEFECTO, resultado['hoja'])
+
+
+@dataclass
+class PlanLeido:
+    total: int = 0                                # órdenes distintas (una por lote_completo)
+    hojas: list = field(default_factory=list)     # resumen por archivo/hoja
+    errores: list = field(default_factory=list)
+    segundos: float = 0.0
+    _leidas: list = field(default_factory=list, repr=False)    # resultado de cada hoja, en orden
+    _por_lote: dict = field(default_factory=dict, repr=False)  # LOTE → (huella_completa, n.º de hoja)
+
+    def bloques(self, tam_lote=TAMANO_LOTE_DEFECTO):
+        """Una fila por LOTE, la que ganó en la validación, en bloques de `tam_lote`."""
+        emitidos = set()
+        bloque = []
+        for n, resultado in enumerate(self._leidas):
+            if resultado['ignorada'] or resultado['error']:
+                continue
+            for parte in _bloques_de(resultado):
+                for f in parte:
+                    if f[0] in emitidos or self._por_lote.get(f[0]) != (huella_completa(f), n):
+                        continue
+                    emitidos.add(f[0])
+                    bloque.append(f)
+                    if len(bloque) >= tam_lote:
+                        yield bloque
+                        bloque = []
+        if bloque:
+            yield bloque
+
+    def cerrar(self):
+        """Borra los volcados de los procesos. Los libros son de quien los pasó."""
+        borrar_temporales([(None, r['volcado']) for r in self._leidas if r['volcado']])
+        self._leidas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+def _leer_tareas(tareas):
+    """Resultados en el orden de `tareas`; sin pool, las hojas quedan para leer aquí."""
+    global _procesos
+    if len(tareas) <= 1 or _num_procesos() == 1:
+        return [_sin_leer(t) for t in tareas]
+    pool = _pool_procesos()
+    futuros = [pool.submit(parsear_hoja, t) for t in tareas]
+    try:
+        return [f.result() for f in futuros]
+    except Exception as e:
+        # Los volcados de las hojas que sí terminaron no los va a borrar nadie más
+        wait(futuros)
+        for f in futuros:
+            if not f.cancelled() and f.exception() is None and f.result()['volcado']:
+                borrar_temporales([(None, f.result()['volcado'])])
+        if not isinstance(e, BrokenProcessPool):
+            raise
+        # Un proceso murió (memoria, señal): se cierra el pool roto y se lee aquí
+        with _procesos_lock:
+            if _procesos is pool:
+                _procesos = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return [_sin_leer(t) for t in tareas]
+
+
+def _sin_leer(tarea):
+    nombre_archivo, ruta, hoja = tarea
+    return {'archivo': nombre_archivo, 'hoja': hoja, 'ruta': ruta, 'volcado': None,
+            'filas': None, 'error': None, 'ignorada': False, 'segundos': 0.0}
+
+
+def parsear_archivos(archivos):
+    """
+    `archivos`: [(nombre, ruta)]. Lee todas las hojas de todos los libros en
+    paralelo y las valida juntas; las filas se piden después con
+    plan.bloques() y el plan se cierra con plan.cerrar() (o con `with`).
+    Un mismo LOTE en dos hojas solo se acepta si trae los mismos datos;
+    dentro de una hoja gana la última fila, como antes.
+    """
+    inicio = time.perf_counter()
+    tareas = []
+    for nombre, ruta in archivos:
+        tareas.extend((nombre, ruta, hoja) for hoja in listar_hojas(ruta))
+
+    plan = PlanLeido()
+    try:
+        for r in _leer_tareas(tareas):
+            _validar_hoja(plan, r)
+    except Exception:
+        plan.cerrar()
+        raise
+
+    if not plan._por_lote and not plan.errores:
+        plan.errores.append("Ninguna hoja tiene las columnas del plan de producción.")
+    plan.errores = plan.errores[:MAX_ERRORES]
+    plan.total = len(plan._por_lote)
+    plan.segundos = round(time.perf_counter() - inicio, 3)
+    return plan
+
+
+def _validar_hoja(plan, r):
+    """Recorre los bloques de una hoja anotando LOTE → (huella_completa, hoja) en el plan."""
+    origen = f"{r['archivo']} / {r['hoja']}"
+    n = len(plan._leidas)
+    plan._leidas.append(r)
+    inicio = time.perf_counter()
+    filas = 0
+    try:
+        if r['error']:
+            raise ValueError(r['error'])
+        if not r['ignorada']:
+            for parte in _bloques_de(r):
+                filas += len(parte)
+                for f in parte:
+                    huella = huella_completa(f)
+                    previa = plan._por_lote.get(f[0])
+                    if previa is not None and previa[1] != n and previa[0] != huella:
+                        otra = plan._leidas[previa[1]]
+                        plan.errores.append(
+                            f"LOTE {f[0]} tiene datos distintos en '{otra['archivo']} / {otra['hoja']}' y '{origen}'"
+                        )
+                        continue
+                    plan._por_lote[f[0]] = (huella, n)
+    except HojaSinPlan:
+        r['ignorada'] = True
+    except ValueError as e:
+        r['error'] = str(e)
+        plan.errores.append(f"{origen}: {e}")
+        return
+    segundos = r['segundos'] if r['volcado'] else round(time.perf_counter() - inicio, 3)
+    plan.hojas.append({'archivo': r['archivo'], 'hoja': r['hoja'], 'filas': filas,
+                       'ignorada': r['ignorada'], 'segundos': segundos})
+
+
+def normalizar_fila(valores):
+    """Valores en el orden de COLUMNAS_EXCEL → tupla para el INSERT de ordenes."""
+    valores = [None if isinstance(v, float) and math.isnan(v) else v for v in valores]
+    lote_completo = str(valores[0])
+    lote_padre = lote_completo.split('-')[0]
+    return (lote_completo, lote_padre, *valores[1:])
+
+
+def construir_filas(df):
+    """
+    Convierte el DataFrame en tuplas listas para INSERT, columna por columna
+    (sin iterrows). tolist() entrega tipos nativos de Python y los NaN se
+    cambian por None al armar cada tupla.
+    """
+    columnas = [df[c].tolist() for c in COLUMNAS_EXCEL]
+    return [normalizar_fila(valores) for valores in zip(*columnas)]
+
+
+def guardar_ordenes(conn, bloques, al_avanzar=None):
+    """
+    Upsert masivo de órdenes, INSERT multi-fila preparado, todo dentro de una
+    sola transacción (el commit lo hace quien llama). `bloques` puede ser un
+    generador: cada bloque se escribe antes de pedir el siguiente.
+    Por cada bloque se leen lote_completo y hash_fila de las órdenes que ya
+    existen: solo se escriben las nuevas y las que cambiaron, las idénticas no
+    tocan índices ni toman bloqueos. `al_avanzar(resumen_lote, filas_hechas)`
+    se llama después de cada bloque.
+    """
+    cursor = conn.cursor()
+    vistos = set()
+    resumen = []
+    hechas = 0
+
+    for bloque in bloques:
+        claves = list({f[0] for f in bloque} - vistos)
+
+        guardados = {}
+        if claves:
+            marcadores = ", ".join(["%s"] * len(claves))
+            cursor.execute(
+                f"SELECT lote_completo, hash_fila FROM ordenes WHERE lote_completo IN ({marcadores})",
+                claves
+            )
+            guardados = dict(cursor.fetchall())
+
+        a_escribir = []
+        insertadas = actualizadas = 0
+        for f in bloque:
+            huella = hash_fila(f)
+            if f[0] in vistos:
+                # Repetida dentro del mismo archivo: gana la última, como antes
+                actualizadas += 1
+            elif f[0] not in guardados:
+                insertadas += 1
+            elif guardados[f[0]] != huella:
+                actualizadas += 1
+            else:
+                vistos.add(f[0])
+                continue
+            vistos.add(f[0])
+            a_escribir.append((*f, huella))
+
+        if a_escribir:
+            # INSERT multi-fila preparado (src/utils.py: 'upsert_ordenes')
+            conn.ejecutar_filas('upsert_ordenes', a_escribir)
+            # La meta del lote sale de cantidad_planchas: se recalcula el saldo de los lotes tocados
+            saldo_lote.reconstruir(cursor, {f[1] for f in a_escribir})
+        hechas += len(bloque)
+
+        info_lote = {
+            'lote': len(resumen) + 1,
+            'filas': len(bloque),
+            'insertadas': insertadas,
+            'actualizadas': actualizadas,
+            'sin_cambios': len(bloque) - len(a_escribir),
+        }
+        resumen.append(info_lote)
+        if al_avanzar:
+            al_avanzar(info_lote, hechas)
+
+    return resumen
@@ -0,0 +1,245 @@
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MÉTRICAS DE CONSULTAS
+# get_connection() entrega cursores que miden cada sentencia: huella del SQL
+# (literales y listas IN colapsadas), duración (execute + fetch), filas y la
+# función que la llamó. Cada medición queda asociada a la página del rerun
+# en curso (app.py la fija con en_pagina) para sacar cantidad de consultas
+# por rerun y p50/p95 por página.
+#   SQL_METRICAS         → 0 desactiva los cursores medidos
+#   SQL_LENTO_MS         → umbral del log de consultas lentas
+#   SQL_LENTO_ARCHIVO    → además del stderr, escribe el log en este archivo
+#   SQL_MUESTRAS         → mediciones que se guardan por página
+# ─────────────────────────────────────────────────────────────────────────────
+
+ACTIVAS = os.getenv("SQL_METRICAS", "1") != "0"
+UMBRAL_LENTO_MS = float(os.getenv("SQL_LENTO_MS", 200))
+MUESTRAS_POR_PAGINA = int(os.getenv("SQL_MUESTRAS", 5000))
+
+log_lentas = logging.getLogger("planta.sql_lento")
+if os.getenv("SQL_LENTO_ARCHIVO"):
+    _manejador = logging.FileHandler(os.getenv("SQL_LENTO_ARCHIVO"), encoding="utf-8")
+    _manejador.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    log_lentas.addHandler(_manejador)
+    log_lentas.setLevel(logging.WARNING)
+
+_pagina = contextvars.ContextVar("pagina", default="sin_pagina")
+_lock = threading.Lock()
+_muestras = {}      # pagina → deque de mediciones (las últimas MUESTRAS_POR_PAGINA)
+_reruns = {}        # pagina → reruns medidos
+_consultas = {}     # pagina → consultas medidas (todas, para consultas por rerun)
+_por_huella = {}    # huella → {'veces', 'total_ms', 'max_ms', 'filas', 'funcion'}
+
+
+@contextmanager
+def en_pagina(nombre):
+    """Etiqueta las consultas hechas dentro del bloque (un rerun de una página)."""
+    token = _pagina.set(nombre)
+    with _lock:
+        _reruns[nombre] = _reruns.get(nombre, 0) + 1
+    try:
+        yield
+    finally:
+        _pagina.reset(token)
+
+
+_RE_ESPACIOS = re.compile(r"\s+")
+_RE_CADENAS = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTAS = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)")
+
+
+@lru_cache(maxsize=2048)
+def huella_sql(sql):
+    """Misma huella para la misma consulta con otros valores o largo de IN (...)."""
+    texto = _RE_ESPACIOS.sub(" ", sql).strip()
+    texto = _RE_CADENAS.sub("?", texto)
+    texto = _RE_NUMEROS.sub("?", texto)
+    return _RE_LISTAS.sub("(...)", texto)
+
+
+def _funcion_llamadora(profundidad=2):
+    marco = sys._getframe(profundidad)
+    # Las sentencias registradas se ejecutan desde ConexionPool: cuenta quien la pidió
+    while marco.f_back is not None and marco.f_globals.get('__name__') == 'src.database':
+        marco = marco.f_back
+    return f"{marco.f_globals.get('__name__', '?')}.{marco.f_code.co_name}"
+
+
+def _registrar(medicion):
+    pagina = medicion['pagina']
+    with _lock:
+        _consultas[pagina] = _consultas.get(pagina, 0) + 1
+        muestras = _muestras.get(pagina)
+        if muestras is None:
+            muestras = _muestras[pagina] = deque(maxlen=MUESTRAS_POR_PAGINA)
+        muestras.append(medicion)
+
+
+def _cerrar(medicion):
+    """Acumula por huella y escribe el log si pasó el umbral. Se llama una vez por sentencia."""
+    with _lock:
+        agg = _por_huella.get(medicion['huella'])
+        if agg is None:
+            agg = _por_huella[medicion['huella']] = {
+                'veces': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'filas': 0, 'funcion': medicion['funcion']
+            }
+        agg['veces'] += 1
+        agg['total_ms'] += medicion['ms']
+        agg['max_ms'] = max(agg['max_ms'], medicion['ms'])
+        agg['filas'] += max(medicion['filas'], 0)
+    if medicion['ms'] >= UMBRAL_LENTO_MS:
+        log_lentas.warning(
+            "consulta lenta %.1f ms filas=%s pagina=%s funcion=%s sql=%s",
+            medicion['ms'], medicion['filas'], medicion['pagina'], medicion['funcion'],
+            medicion['huella'][:500]
+        )
+
+
+class CursorMedido:
+    """Envuelve un cursor de mysql.connector (o de SQLite) y mide cada sentencia."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._medicion = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def _terminar_anterior(self):
+        if self._medicion is not None:
+            _cerrar(self._medicion)
+            self._medicion = None
+
+    def _medir(self, metodo, sql, params, filas):
+        self._terminar_anterior()
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, params)
+        finally:
+            medicion = {
+                'pagina': _pagina.get(),
+                'huella': huella_sql(sql),
+                'funcion': _funcion_llamadora(3),
+                'ms': (time.perf_counter() - inicio) * 1000,
+                'filas': filas if filas is not None else self._cursor.rowcount,
+            }
+            _registrar(medicion)
+            if self._cursor.description is None:
+                _cerrar(medicion)       # sin resultado que leer: ya terminó
+            else:
+                self._medicion = medicion
+
+    def execute(self, sql, params=()):
+        return self._medir(self._cursor.execute, sql, params, None)
+
+    def executemany(self, sql, filas):
+        filas = list(filas)
+        return self._medir(self._cursor.executemany, sql, filas, len(filas))
+
+    def _leer(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        if self._medicion is not None:
+            self._medicion['ms'] += (time.perf_counter() - inicio) * 1000
+            if isinstance(resultado, list):
+                self._medicion['filas'] = max(self._medicion['filas'], 0) + len(resultado)
+            elif resultado is not None:
+                self._medicion['filas'] = max(self._medicion['filas'], 0) + 1
+        return resultado
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._leer(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        resultado = self._leer(self._cursor.fetchall)
+        self._terminar_anterior()
+        return resultado
+
+    def __iter__(self):
+        fila = self.fetchone()
+        while fila is not None:
+            yield fila
+            fila = self.fetchone()
+
+    def close(self):
+        self._terminar_anterior()
+        return self._cursor.close()
+
+    def __del__(self):
+        try:
+            self._terminar_anterior()
+        except Exception:
+            pass
+
+
+def envolver(cursor):
+    return CursorMedido(cursor) if ACTIVAS else cursor
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RESÚMENES
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+def resumen_paginas():
+    """
+    Por página: reruns, consultas, consultas por rerun y p50/p95/máx en ms.
+    Los percentiles salen de las últimas MUESTRAS_POR_PAGINA mediciones; los
+    conteos, de todas.
+    """
+    with _lock:
+        copia = {p: [m['ms'] for m in d] for p, d in _muestras.items()}
+        reruns = dict(_reruns)
+        consultas = dict(_consultas)
+    filas = []
+    for pagina, tiempos in copia.items():
+        ordenados = sorted(tiempos)
+        n_reruns = reruns.get(pagina, 0)
+        n_consultas = consultas.get(pagina, len(tiempos))
+        filas.append({
+            'pagina': pagina,
+            'reruns': n_reruns,
+            'consultas': n_consultas,
+            'consultas_por_rerun': round(n_consultas / n_reruns, 1) if n_reruns else None,
+            'p50_ms': round(_percentil(ordenados, 50), 2),
+            'p95_ms': round(_percentil(ordenados, 95), 2),
+            'max_ms': round(ordenados[-1], 2) if ordenados else 0.0,
+        })
+    return sorted(filas, key=lambda f: f['p95_ms'], reverse=True)
+
+
+def consultas_mas_costosas(limite=15):
+    with _lock:
+        filas = [{'huella': h, **agg} for h, agg in _por_huella.items()]
+    for f in filas:
+        f['promedio_ms'] = round(f['total_ms'] / f['veces'], 2)
+        f['total_ms'] = round(f['total_ms'], 2)
+        f['max_ms'] = round(f['max_ms'], 2)
+    return sorted(filas, key=lambda f: f['total_ms'], reverse=True)[:limite]
+
+
+def reiniciar():
+    with _lock:
+        _muestras.clear()
+        _reruns.clear()
+        _consultas.clear()
+        _por_huella.clear()
@@ -0,0 +1,341 @@
+import argparse
+from src.database import get_connection, es_sqlite
+from src import saldo_lote, trabajos, ingesta, resumenes, auth, snapshot
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MIGRACIONES DE ESQUEMA
+# Cada migración tiene un número de versión y se aplica una sola vez; las ya
+# aplicadas quedan registradas en schema_migraciones. Las tablas base usan
+# CREATE TABLE IF NOT EXISTS para poder adoptar una base de datos existente.
+#
+#   python -m src.migraciones aplicar     → aplica las pendientes
+#   python -m src.migraciones estado      → muestra versiones aplicadas
+#   python -m src.migraciones verificar   → EXPLAIN de las consultas críticas
+# ─────────────────────────────────────────────────────────────────────────────
+
+DDL_MIGRACIONES = """
+    CREATE TABLE IF NOT EXISTS schema_migraciones (
+        version      INT NOT NULL,
+        descripcion  VARCHAR(200) NOT NULL,
+        aplicada     TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version)
+    )
+"""
+
+DDL_BASE = [
+    """
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id              INT NOT NULL AUTO_INCREMENT,
+        nombre_usuario  VARCHAR(50) NOT NULL,
+        clave           VARCHAR(255) NOT NULL,
+        rol             VARCHAR(20) NOT NULL DEFAULT 'personal',
+        PRIMARY KEY (id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ordenes (
+        id                 INT NOT NULL AUTO_INCREMENT,
+        lote_completo      VARCHAR(50) NOT NULL,
+        lote_padre         VARCHAR(50) NOT NULL,
+        id_maquina         VARCHAR(50),
+        nombre_maquina     VARCHAR(100),
+        cantidad_planchas  INT,
+        ancho_pl           DECIMAL(10,2),
+        desaplancha        DECIMAL(10,2),
+        espesor            DECIMAL(8,2),
+        calidad            VARCHAR(50),
+        largo              INT,
+        desarrollo         INT,
+        cant               INT,
+        can_total          INT,
+        destino            VARCHAR(20),
+        cof_FA             VARCHAR(50),
+        cod_SAP            VARCHAR(50),
+        cod_UTIL           VARCHAR(50),
+        cod_IBS            VARCHAR(50),
+        peso_unitario      DECIMAL(14,4),
+        peso_total         DECIMAL(14,4),
+        orden              BIGINT,
+        lot_insp           VARCHAR(50),
+        COD_proceso        VARCHAR(50),
+        descrip_SAP        VARCHAR(255),
+        hash_fila          CHAR(32),
+        fecha_subida       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id),
+        UNIQUE KEY uq_ordenes_lote_completo (lote_completo)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS produccion (
+        id_registro          INT NOT NULL AUTO_INCREMENT,
+        lote_referencia      VARCHAR(50) NOT NULL,
+        id_personal          INT NOT NULL,
+        planchas_procesadas  INT NOT NULL DEFAULT 0,
+        maquina_real         VARCHAR(100),
+        maq_proces           VARCHAR(100),
+        operador             VARCHAR(100),
+        hora_inicio          DATETIME NOT NULL,
+        hora_fin             DATETIME,
+        estado               VARCHAR(20) NOT NULL DEFAULT 'procesando',
+        orden                BIGINT,
+        can_total            INT,
+        desarrollo           INT,
+        largo                INT,
+        espesor              DECIMAL(8,2),
+        peso_unitario        DECIMAL(14,4),
+        peso_total           DECIMAL(14,4),
+        fecha_emision        DATETIME,
+        lote_de_planchas     VARCHAR(50),
+        ancho_real           INT,
+        observacciones       VARCHAR(100),
+        tiempo_total         TIME,
+        cant_cortada_real    INT,
+        ancho_fleje_real     INT,
+        destino_real         VARCHAR(20),
+        merma                DECIMAL(14,4),
+        tiempo_ponderado     TIME,
+        PRIMARY KEY (id_registro)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS detalles_produccion (
+        id_detalle              INT NOT NULL AUTO_INCREMENT,
+        id_registro_produccion  INT NOT NULL,
+        lote_completo           VARCHAR(50) NOT NULL,
+        cant_cortada_real       INT,
+        ancho_fleje_real        INT,
+        destino_real            VARCHAR(20),
+        PRIMARY KEY (id_detalle)
+    )
+    """,
+]
+
+# (tabla, nombre_indice, columnas, único)
+INDICES = [
+    ('ordenes', 'idx_ordenes_lote_padre', 'lote_padre, lote_completo', False),
+    ('ordenes', 'idx_ordenes_desarrollo', 'desarrollo', False),
+    ('ordenes', 'idx_ordenes_maquina', 'nombre_maquina', False),
+    ('produccion', 'idx_produccion_personal_estado', 'id_personal, estado', False),
+    ('produccion', 'idx_produccion_lote_estado', 'lote_referencia, estado', False),
+    ('detalles_produccion', 'idx_detalles_registro', 'id_registro_produccion', False),
+    ('usuarios', 'uq_usuarios_nombre', 'nombre_usuario', True),
+]
+
+
+def crear_indice(cursor, tabla, nombre, columnas, unico=False):
+    """MySQL no tiene CREATE INDEX IF NOT EXISTS: se consulta information_schema."""
+    tipo = "UNIQUE INDEX" if unico else "INDEX"
+    if es_sqlite():
+        cursor.execute(f"CREATE {tipo} IF NOT EXISTS {nombre} ON {tabla} ({columnas})")
+        return
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (tabla, nombre))
+    fila = cursor.fetchone()
+    existe = (list(fila.values())[0] if isinstance(fila, dict) else fila[0]) > 0
+    if not existe:
+        cursor.execute(f"CREATE {tipo} {nombre} ON {tabla} ({columnas})")
+
+
+def agregar_columna(cursor, tabla, columna, definicion):
+    """ADD COLUMN solo si la columna no existe (igual que crear_indice)."""
+    if es_sqlite():
+        cursor.execute(f"PRAGMA table_info({tabla})")
+        if columna not in {f[1] for f in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+        return
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (tabla, columna))
+    fila = cursor.fetchone()
+    existe = (list(fila.values())[0] if isinstance(fila, dict) else fila[0]) > 0
+    if not existe:
+        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+
+
+def _m001_esquema_base(cursor):
+    for ddl in DDL_BASE:
+        cursor.execute(ddl)
+
+
+def _m002_saldo_lote(cursor):
+    saldo_lote.crear_tabla(cursor)
+    saldo_lote.reconstruir(cursor)
+
+
+def _m003_indices(cursor):
+    for tabla, nombre, columnas, unico in INDICES:
+        crear_indice(cursor, tabla, nombre, columnas, unico)
+
+
+def _m004_clave_hash(cursor):
+    # Las claves pasan a guardarse como hash pbkdf2 (ver src/auth.py).
+    # SQLite no limita el largo de VARCHAR: no hay nada que cambiar.
+    if es_sqlite():
+        return
+    cursor.execute("ALTER TABLE usuarios MODIFY clave VARCHAR(255) NOT NULL")
+
+
+def _m005_trabajos_ingesta(cursor):
+    trabajos.crear_tabla(cursor)
+
+
+def _m006_huellas_ingesta(cursor):
+    ingesta.crear_tabla_archivos(cursor)
+    agregar_columna(cursor, 'ordenes', 'hash_fila', 'CHAR(32) NULL')
+    agregar_columna(cursor, 'trabajos_ingesta', 'sin_cambios', 'INT NOT NULL DEFAULT 0')
+
+
+def _m007_resumenes(cursor):
+    resumenes.crear_tablas(cursor)
+    resumenes.reconstruir(cursor)
+
+
+def _m008_indice_exportacion(cursor):
+    crear_indice(cursor, 'produccion', 'idx_produccion_hora_inicio', 'hora_inicio')
+
+
+def _m009_sesiones(cursor):
+    auth.crear_tabla_sesiones(cursor)
+
+
+def _m010_dueno_trabajos(cursor):
+    agregar_columna(cursor, 'trabajos_ingesta', 'proceso', 'VARCHAR(100) NULL')
+    agregar_columna(cursor, 'trabajos_ingesta', 'latido', 'DATETIME NULL')
+
+
+MIGRACIONES = [
+    (1, "Esquema base: usuarios, ordenes, produccion, detalles_produccion", _m001_esquema_base),
+    (2, "Tabla saldo_lote", _m002_saldo_lote),
+    (3, "Índices de las consultas críticas", _m003_indices),
+    (4, "usuarios.clave con espacio para hash pbkdf2", _m004_clave_hash),
+    (5, "Tabla trabajos_ingesta (cargas en segundo plano)", _m005_trabajos_ingesta),
+    (6, "Huellas de archivo y de fila para recargas sin cambios", _m006_huellas_ingesta),
+    (7, "Resúmenes diarios de producción (día × máquina × operador × destino)", _m007_resumenes),
+    (8, "Índice de produccion por hora_inicio (exportación por fechas)", _m008_indice_exportacion),
+    (9, "Tabla sesiones (tokens de sesión revocables)", _m009_sesiones),
+    (10, "Proceso dueño y latido de trabajos_ingesta", _m010_dueno_trabajos),
+]
+
+
+def versiones_aplicadas(cursor):
+    cursor.execute(DDL_MIGRACIONES)
+    cursor.execute("SELECT version FROM schema_migraciones")
+    return {(f['version'] if isinstance(f, dict) else f[0]) for f in cursor.fetchall()}
+
+
+def aplicar(conn):
+    """Aplica en orden las migraciones pendientes. Devuelve las versiones aplicadas."""
+    cursor = conn.cursor()
+    hechas = versiones_aplicadas(cursor)
+    nuevas = []
+    for version, descripcion, migrar in MIGRACIONES:
+        if version in hechas:
+            continue
+        # Los DDL de MySQL hacen commit implícito: cada migración se registra
+        # apenas termina para que un fallo no obligue a repetir las anteriores.
+        migrar(cursor)
+        cursor.execute(
+            "INSERT INTO schema_migraciones (version, descripcion) VALUES (%s, %s)",
+            (version, descripcion)
+        )
+        conn.commit()
+        nuevas.append(version)
+    return nuevas
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# VERIFICACIÓN DE PLANES
+# EXPLAIN de cada consulta caliente; type = 'ALL' significa que MySQL recorre
+# la tabla completa (no encontró índice útil). Con tablas casi vacías el
+# optimizador puede preferir un recorrido completo, así que conviene correrla
+# sobre una copia con datos reales.
+# En SQLite se usa EXPLAIN QUERY PLAN: un paso "SCAN tabla" sin índice es el
+# equivalente a type = 'ALL'.
+# ─────────────────────────────────────────────────────────────────────────────
+
+CONSULTAS_CRITICAS = [
+    ("login", """
+        SELECT id, nombre_usuario, rol FROM usuarios WHERE nombre_usuario = %s
+    """, ('x',)),
+    # Pantalla del operario: las dos consultas de snapshot.cargar_snapshot
+    ("sesion_y_version", snapshot.QUERY_SESION_Y_VERSION, ('0', 0)),
+    ("ordenes_y_saldo", snapshot.QUERY_ORDENES_Y_SALDO, ('0',)),
+    ("saldo_lote", """
+        SELECT meta, finalizado, en_proceso FROM saldo_lote WHERE lote_padre = %s
+    """, ('0',)),
+    ("registros_activos", """
+        SELECT p.id_registro, p.lote_referencia
+        FROM produccion p
+        INNER JOIN ordenes o ON p.lote_referencia = o.lote_completo
+        WHERE o.lote_padre = %s AND p.estado = 'procesando'
+    """, ('0',)),
+    ("exportacion_por_fechas", """
+        SELECT p.* FROM produccion p
+        WHERE p.hora_inicio >= %s AND p.hora_inicio < %s
+        ORDER BY p.hora_inicio, p.id_registro
+    """, ('2000-01-01', '2000-01-02')),
+]
+
+
+def verificar_planes(conn):
+    """Devuelve [(consulta, tabla, tipo, clave)] de los pasos que recorren tablas completas."""
+    if es_sqlite():
+        return _verificar_planes_sqlite(conn)
+    cursor = conn.cursor(dictionary=True)
+    problemas = []
+    for nombre, query, params in CONSULTAS_CRITICAS:
+        cursor.execute("EXPLAIN " + query, params)
+        for paso in cursor.fetchall():
+            tabla = paso.get('table') or ''
+            if paso.get('type') == 'ALL' and not tabla.startswith('<'):
+                problemas.append((nombre, tabla, paso.get('type'), paso.get('key')))
+    return problemas
+
+
+def _verificar_planes_sqlite(conn):
+    cursor = conn.cursor()
+    problemas = []
+    for nombre, query, params in CONSULTAS_CRITICAS:
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        pasos = [paso[3] for paso in cursor.fetchall()]
+        # Como los <derived> de MySQL: subconsultas y filas constantes no son tablas
+        derivadas = {"CONSTANT"} | {
+            d.split()[1] for d in pasos if d.startswith(("CO-ROUTINE ", "MATERIALIZE "))
+        }
+        for detalle in pasos:
+            if detalle.startswith("SCAN ") and " INDEX " not in detalle:
+                tabla = detalle.split()[1]
+                if tabla not in derivadas:
+                    problemas.append((nombre, tabla, "SCAN", None))
+    return problemas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones de esquema e índices")
+    parser.add_argument("accion", choices=["aplicar", "estado", "verificar"])
+    args = parser.parse_args()
+
+    conn = get_connection()
+    if not conn:
+        raise SystemExit(1)
+    try:
+        if args.accion == "aplicar":
+            nuevas = aplicar(conn)
+            print(f"Migraciones aplicadas: {nuevas or 'ninguna (al día)'}")
+        elif args.accion == "estado":
+            hechas = versiones_aplicadas(conn.cursor())
+            for version, descripcion, _ in MIGRACIONES:
+                marca = "✔" if version in hechas else "pendiente"
+                print(f"{version:03d}  {marca:9}  {descripcion}")
+        else:
+            problemas = verificar_planes(conn)
+            for nombre, tabla, tipo, clave in problemas:
+                print(f"✘ {nombre}: recorrido completo de '{tabla}' (type={tipo}, key={clave})")
+            if problemas:
+                raise SystemExit(1)
+            print(f"✔ {len(CONSULTAS_CRITICAS)} consultas usan índices.")
+    finally:
+        conn.close()
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+import pandas as pd
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MODELO DE ÓRDENES EN MEMORIA
+#   TablaOrdenes   → las órdenes de un lote tal como vienen de la base, por
+#                    columnas (una tupla por columna, sin un dict por fila).
+#                    Es lo que guarda SnapshotLote en la sesión.
+#   OrdenEditable  → una orden de la tanda en edición (st.session_state.
+#                    ordenes_editables). Con __slots__: sin __dict__ por
+#                    instancia y se serializa como una tupla de valores.
+# Las dos se pasan a DataFrame columna por columna (a_dataframe).
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+class TablaOrdenes:
+    __slots__ = ('columnas', '_datos', '_posicion')
+
+    def __init__(self, columnas, datos):
+        """`datos`: una secuencia de valores por cada nombre de `columnas`."""
+        self.columnas = tuple(columnas)
+        self._datos = tuple(tuple(d) for d in datos)
+        self._posicion = {c: i for i, c in enumerate(self.columnas)}
+
+    @classmethod
+    def desde_filas(cls, filas, excluir=()):
+        """Filas dict de un cursor(dictionary=True); `excluir` deja columnas afuera."""
+        if not filas:
+            return cls((), ())
+        columnas = [c for c in filas[0] if c not in excluir]
+        return cls(columnas, ([f[c] for f in filas] for c in columnas))
+
+    def __len__(self):
+        return len(self._datos[0]) if self._datos else 0
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getstate__(self):
+        return self.columnas, self._datos
+
+    def __setstate__(self, estado):
+        self.__init__(*estado)
+
+    def columna(self, nombre, defecto=None):
+        i = self._posicion.get(nombre)
+        return self._datos[i] if i is not None else (defecto,) * len(self)
+
+    def fila(self, i):
+        """La fila i como dict (para lecturas sueltas, no para recorrer la tabla)."""
+        return {c: d[i] for c, d in zip(self.columnas, self._datos)}
+
+    def a_dataframe(self, titulos, defecto=None):
+        """`titulos`: {título en pantalla: columna}."""
+        return pd.DataFrame({t: self.columna(c, defecto) for t, c in titulos.items()})
+
+
+@dataclass(slots=True)
+class OrdenEditable:
+    lote_completo: str
+    cant_cortada: int = 0
+    ancho_fleje: int = 0
+    destino: str = 'VENTA'
+    largo: int = 0
+    espesor: float = 0.0
+    cod_SAP: str = ''
+    cod_IBS: str = ''
+    descrip_SAP: str = ''
+    peso_unitario: float = 0.0
+    peso_total: float = 0.0
+    planchas_procesadas: int = 0
+    cant: int = 0
+    can_total: int = 0
+    orden: int = 0
+    desarrollo: int = 0
+    es_nueva: bool = False
+
+    def __reduce__(self):
+        # Solo los valores, en el orden de los campos: sin nombres ni estado aparte
+        return OrdenEditable, tuple(getattr(self, c) for c in self.__slots__)
+
+    def aplicar_referencia(self, ref):
+        """`ref` de referencias.IndiceDesarrollo.buscar."""
+        self.peso_unitario = ref['peso_unitario']
+        self.largo = ref['largo']
+        self.espesor = ref['espesor']
+
+
+def editables_desde_tabla(tabla, planchas_proc):
+    """Una OrdenEditable por orden del lote, con cant_cortada = cant × planchas y su peso_total."""
+    return [
+        OrdenEditable(
+            lote_completo=lote,
+            cant_cortada=int(cant * planchas_proc),
+            ancho_fleje=int(desarrollo or 0),
+            destino=destino or 'VENTA',
+            largo=int(largo or 0),
+            espesor=float(espesor or 0),
+            cod_SAP=sap or '',
+            cod_IBS=ibs or '',
+            descrip_SAP=descrip or '',
+            peso_unitario=float(peso or 0),
+            peso_total=int(cant * planchas_proc) * float(peso or 0),
+            planchas_procesadas=planchas_proc,
+            cant=int(cant or 0),
+            can_total=int(can_total or 0),
+            orden=int(orden or 0),
+            desarrollo=int(desarrollo or 0),
+        )
+        for lote, cant, desarrollo, destino, largo, espesor, sap, ibs, descrip, peso, can_total, orden in zip(
+            *(tabla.columna(c) for c in (
+                'lote_completo', 'cant', 'desarrollo', 'destino', 'largo', 'espesor',
+                'cod_SAP', 'cod_IBS', 'descrip_SAP', 'peso_unitario', 'can_total', 'orden'
+            ))
+        )
+    ]
+
+
+def a_dataframe(ordenes, titulos):
+    """Lista de OrdenEditable → DataFrame. `titulos`: {título en pantalla: atributo}."""
+    return pd.DataFrame({t: [getattr(o, c) for o in ordenes] for t, c in titulos.items()})
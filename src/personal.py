@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 from src.database import get_connection
+from src import saldo_lote, referencias, snapshot, calculos, resumenes, modelo_ordenes
 
 def mostrar_pantalla():
     st.title("🛠️ Registro de Producción")
@@ -21,48 +21,29 @@ def mostrar_pantalla():
         st.info("Ingrese primero el número de lote para continuar.")
         return
 
-    conn = get_connection()
+    id_operario = st.session_state.usuario["id"]
+    nombre_operador = st.session_state.usuario.get("nombre_usuario", "Operador")
+
+    # Todo lo que la pantalla necesita del lote, en una o dos idas a la base.
+    # La conexión se devuelve antes de dibujar: los botones pueden hacer st.rerun().
+    # Solo lectura: puede venir de la réplica (después de iniciar/finalizar, del primario).
+    conn = get_connection(solo_lectura=True)
     if not conn:
         st.error("No hay conexión a la base de datos.")
         return
-
-    cursor = conn.cursor(dictionary=True)
+    try:
+        snap = snapshot.cargar_snapshot(conn, lote_padre, id_operario, memo=st.session_state)
+    finally:
+        conn.close()
 
     # VERIFICAR SESIÓN ACTIVA DEL OPERARIO
-    id_operario = st.session_state.usuario["id"]
-    nombre_operador = st.session_state.usuario.get("nombre_usuario", "Operador")
-
-    cursor.execute("""
-        SELECT * FROM produccion 
-        WHERE id_personal = %s AND estado = 'procesando'
-        LIMIT 1
-    """, (id_operario,))
-    sesion_activa = cursor.fetchone()
-
-    if sesion_activa:
-        cursor.execute("""
-            SELECT lote_padre 
-            FROM ordenes 
-            WHERE lote_completo = %s
-        """, (sesion_activa['lote_referencia'],))
-        
-        lote_de_sesion = cursor.fetchone()
-        
-        if lote_de_sesion and lote_de_sesion['lote_padre'] != lote_padre:
-            st.error(f"⚠️ Tienes una producción activa en el lote **{lote_de_sesion['lote_padre']}**. Finalízala primero.")
-            conn.close()
-            return
+    if snap.sesion_en_otro_lote:
+        st.error(f"⚠️ Tienes una producción activa en el lote **{snap.lote_de_sesion}**. Finalízala primero.")
+        return
 
-    cursor.execute("SELECT DISTINCT nombre_maquina FROM ordenes WHERE nombre_maquina IS NOT NULL ORDER BY nombre_maquina")
-    lista_maquinas = ["Seleccione Máquina..."] + [row['nombre_maquina'] for row in cursor.fetchall()]
+    lista_maquinas = ["Seleccione Máquina..."] + snap.maquinas
     
-    cursor.execute("""
-        SELECT nombre_maquina, espesor, calidad, ancho_pl, desaplancha
-        FROM ordenes 
-        WHERE lote_padre = %s 
-        LIMIT 1
-    """, (lote_padre,))
-    datos_prog = cursor.fetchone()
+    datos_prog = snap.datos_programados
     
     if datos_prog:
         maquina_programada  = datos_prog['nombre_maquina'] or "No asignada"
@@ -80,37 +61,15 @@ def mostrar_pantalla():
     # desaplancha es el aprovechamiento real — se usa como límite en la validación de áreas
     st.session_state['ancho_pl_lote'] = desaplancha_prog
 
-    query_saldo = """
-        SELECT 
-            MAX(o.cantidad_planchas) as meta,
-            IFNULL((SELECT SUM(sub.planchas) FROM (
-                SELECT MAX(p.planchas_procesadas) as planchas
-                FROM produccion p
-                INNER JOIN ordenes o2 ON p.lote_referencia = o2.lote_completo
-                WHERE o2.lote_padre = %s AND p.estado = 'finalizado'
-                GROUP BY p.hora_inicio, p.id_personal
-            ) sub), 0) as finalizado,
-            IFNULL((SELECT SUM(sub.planchas) FROM (
-                SELECT MAX(p.planchas_procesadas) as planchas
-                FROM produccion p
-                INNER JOIN ordenes o2 ON p.lote_referencia = o2.lote_completo
-                WHERE o2.lote_padre = %s AND p.estado = 'procesando'
-                GROUP BY p.hora_inicio, p.id_personal
-            ) sub), 0) as en_proceso
-        FROM ordenes o WHERE o.lote_padre = %s
-    """
-    cursor.execute(query_saldo, (lote_padre, lote_padre, lote_padre))
-    resumen = cursor.fetchone()
-
-    if not resumen or not resumen["meta"]:
+    # Saldo del lote: viene de saldo_lote (mantenida al iniciar/finalizar)
+    if not snap.meta:
         st.warning("⚠️ No se encontraron órdenes para este lote.")
-        conn.close()
         return
 
-    meta = int(resumen["meta"] or 0)
-    finalizado = int(resumen["finalizado"] or 0)
-    en_proceso = int(resumen["en_proceso"] or 0)
-    faltante = meta - (finalizado + en_proceso)
+    meta = snap.meta
+    finalizado = snap.finalizado
+    en_proceso = snap.en_proceso
+    faltante = snap.faltante
     
     progreso_calculado = finalizado / meta if meta > 0 else 0
     progreso_seguro = min(progreso_calculado, 1.0)
@@ -124,21 +83,11 @@ def mostrar_pantalla():
 
     if faltante <= 0 and en_proceso == 0:
         st.success(f"✅ Producción completada: {meta} de {meta} planchas.")
-        conn.close()
         return
 
     st.subheader("⚙️ 2. Registrar Producción")
     
-    cursor.execute("""
-        SELECT p.* 
-        FROM produccion p
-        INNER JOIN ordenes o ON p.lote_referencia = o.lote_completo
-        WHERE p.id_personal = %s 
-          AND o.lote_padre = %s
-          AND p.estado = 'procesando'
-        LIMIT 1
-    """, (id_operario, lote_padre))
-    mi_sesion = cursor.fetchone()
+    mi_sesion = snap.mi_sesion
     
     with st.container(border=True):
         col_f1, col_f2 = st.columns(2)
@@ -168,12 +117,10 @@ def mostrar_pantalla():
             )
             st.info("💡 Revise el detalle abajo antes de Iniciar Producción.")
 
-    cursor.execute("SELECT * FROM ordenes WHERE lote_padre = %s ORDER BY lote_completo", (lote_padre,))
-    ordenes_originales = cursor.fetchall()
+    ordenes_originales = snap.ordenes
 
     if ordenes_originales:
         if mi_sesion:
-            st.session_state.cursor_temp = cursor
             mostrar_tabla_edicion(ordenes_originales, planchas_proc, lote_padre)
             
             btn_fin_disabled = not lote_fisico or ancho_real <= 0
@@ -185,64 +132,51 @@ def mostrar_pantalla():
             if st.button("🚀 INICIAR PRODUCCIÓN", use_container_width=True, disabled=(maquina_real == "Seleccione Máquina...")):
                 iniciar_produccion(lote_padre, planchas_proc, maquina_real, maquina_programada)
 
-    conn.close()
+
+COLUMNAS_LECTURA = {
+    'LOTE': 'lote_completo',
+    'ORDEN': 'orden',
+    'can.total': 'can_total',
+    'Desarrollo': 'desarrollo',
+    'Largo': 'largo',
+    'Espesor': 'espesor',
+    'Destino': 'destino',
+    'Maq. Progam': 'nombre_maquina',
+    'Peso Unt.': 'peso_unitario',
+    'Descripción': 'descrip_SAP',
+    'Fecha Emisión': 'fecha_subida',
+}
 
 
 def mostrar_tabla_lectura(ordenes):
-    datos = []
-    for o in ordenes:
-        datos.append({
-            'LOTE': o['lote_completo'],
-            'ORDEN': o['orden'],
-            'can.total': o['can_total'],
-            'Desarrollo': o['desarrollo'],
-            'Largo': o['largo'],
-            'Espesor': f"{o['espesor']:.2f}",
-            'Destino': o['destino'],
-            'Maq. Progam': o['nombre_maquina'],
-            'Peso Unt.': f"{o['peso_unitario']:.4f}",
-            'Descripción': o.get('descrip_SAP', 'N/A'),
-            'Fecha Emisión': o.get('fecha_subida', 'N/A')
-        })
-    st.dataframe(pd.DataFrame(datos), use_container_width=True, hide_index=True)
+    """`ordenes`: TablaOrdenes del snapshot; el DataFrame se arma directo de sus columnas."""
+    st.dataframe(
+        ordenes.a_dataframe(COLUMNAS_LECTURA, defecto='N/A'),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Espesor': st.column_config.NumberColumn(format="%.2f"),
+            'Peso Unt.': st.column_config.NumberColumn(format="%.4f"),
+        }
+    )
 
 
 def mostrar_tabla_edicion(ordenes_originales, planchas_proc, lote_padre):
-    cursor = st.session_state.get('cursor_temp')
     ancho_pl = st.session_state.get('ancho_pl_lote', 0)
 
     if 'ordenes_editables' not in st.session_state:
-        st.session_state.ordenes_editables = []
-        for o in ordenes_originales:
-            st.session_state.ordenes_editables.append({
-                'lote_completo': o['lote_completo'],
-                'cant_cortada': int(o['cant'] * planchas_proc),
-                'ancho_fleje': int(o['desarrollo'] or 0),
-                'destino': o['destino'] or 'VENTA',
-                'largo': int(o['largo'] or 0),
-                'espesor': float(o['espesor'] or 0),
-                'cod_SAP': o['cod_SAP'] or '',
-                'cod_IBS': o['cod_IBS'] or '',
-                'descrip_SAP': o['descrip_SAP'] or '',
-                'peso_unitario': float(o['peso_unitario'] or 0),
-                'planchas_procesadas': planchas_proc,
-                'cant': int(o['cant'] or 0),
-                'can_total': int(o['can_total'] or 0),
-                'orden': int(o['orden'] or 0),
-                'desarrollo': int(o['desarrollo'] or 0),
-                'es_nueva': False
-            })
+        st.session_state.pop('presupuesto_area', None)
+        st.session_state.ordenes_editables = modelo_ordenes.editables_desde_tabla(ordenes_originales, planchas_proc)
 
     # ─────────────────────────────────────────────────────────────────────────
     # VALIDACIÓN DE ÁREA CORREGIDA
     # Límite  = ancho_pl × planchas_procesadas
     # Suma    = Σ (cant_cortada × ancho_fleje) por cada orden
+    # (llevada por PresupuestoArea: cada cambio de fila la ajusta en O(1))
     # ─────────────────────────────────────────────────────────────────────────
     limite_area = ancho_pl * planchas_proc
-    suma_areas_actual = sum(
-        o['cant_cortada'] * o['ancho_fleje']
-        for o in st.session_state.ordenes_editables
-    )
+    presupuesto = obtener_presupuesto_area(limite_area)
+    suma_areas_actual = presupuesto.total
 
     col_val1, col_val2 = st.columns(2)
     col_val1.metric("Área Máxima (desaplancha × planchas)", f"{limite_area:,} mm²")
@@ -257,17 +191,41 @@ def mostrar_tabla_edicion(ordenes_originales, planchas_proc, lote_padre):
     else:
         col_val2.success(f"✅ Suma Áreas: {suma_areas_actual:,} mm² (Restante: {restante:,} mm²)")
 
+    modo = st.radio(
+        "Modo de edición:", ["Por orden", "Tabla (cambios por lote)"],
+        horizontal=True, key="modo_edicion"
+    )
+    if modo == "Por orden":
+        mostrar_expanders_edicion(presupuesto)
+    else:
+        mostrar_grilla_edicion(presupuesto)
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # BOTÓN AGREGAR: usa suma de áreas vs límite de área
+    # ─────────────────────────────────────────────────────────────────────────
+    puede_agregar = restante > 0
+
+    if st.button("➕ Agregar Nueva Orden", use_container_width=True, disabled=not puede_agregar):
+        agregar_nueva_orden(lote_padre, planchas_proc)
+        st.rerun()
+
+    if not puede_agregar:
+        st.warning("⚠️ No se pueden agregar más órdenes: el área total utilizada alcanzó el límite permitido.")
+
+    mostrar_tabla_resumen()
+
+
+def mostrar_expanders_edicion(presupuesto):
     filas_a_eliminar = []
     for idx, orden in enumerate(st.session_state.ordenes_editables):
-        with st.expander(f"📦 {orden['lote_completo']} {'[NUEVA]' if orden['es_nueva'] else ''}", expanded=True):
+        with st.expander(f"📦 {orden.lote_completo} {'[NUEVA]' if orden.es_nueva else ''}", expanded=True):
             col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
 
             with col1:
-                cant = st.number_input("Cant. Cortada:", min_value=0, value=orden['cant_cortada'], key=f"c_{idx}")
-                st.session_state.ordenes_editables[idx]['cant_cortada'] = cant
-
-                peso_total = cant * st.session_state.ordenes_editables[idx]['peso_unitario']
-                st.session_state.ordenes_editables[idx]['peso_total'] = peso_total
+                cant = st.number_input("Cant. Cortada:", min_value=0, value=orden.cant_cortada, key=f"c_{idx}")
+                orden.cant_cortada = cant
+                presupuesto.actualizar(idx, cant, orden.ancho_fleje)
+                orden.peso_total = cant * orden.peso_unitario
 
             with col2:
                 # ─────────────────────────────────────────────────────────────
@@ -275,177 +233,297 @@ def mostrar_tabla_edicion(ordenes_originales, planchas_proc, lote_padre):
                 # Área disponible = límite - suma de áreas de las otras órdenes
                 # Ancho máximo    = área disponible / cant_cortada de esta orden
                 # ─────────────────────────────────────────────────────────────
-                suma_otras_areas = sum(
-                    o['cant_cortada'] * o['ancho_fleje']
-                    for i, o in enumerate(st.session_state.ordenes_editables)
-                    if i != idx
-                )
-                area_disponible = max(limite_area - suma_otras_areas, 0)
-                cant_esta_orden = st.session_state.ordenes_editables[idx]['cant_cortada']
-
-                if cant_esta_orden > 0:
-                    max_ancho_permitido = int(area_disponible // cant_esta_orden)
-                else:
-                    max_ancho_permitido = 0
+                area_disponible = presupuesto.area_disponible(idx)
+                cant_esta_orden = orden.cant_cortada
+                max_ancho_permitido = presupuesto.max_ancho(idx, cant_esta_orden)
 
                 ancho_n = st.number_input(
                     "Ancho Fleje (mm):",
                     min_value=0,
                     max_value=max_ancho_permitido,
-                    value=min(orden['ancho_fleje'], max_ancho_permitido) if max_ancho_permitido > 0 else 0,
+                    value=min(orden.ancho_fleje, max_ancho_permitido) if max_ancho_permitido > 0 else 0,
                     key=f"a_{idx}",
                     help=f"Máximo permitido: {max_ancho_permitido} mm (área disp.: {area_disponible:,} mm²)"
                 )
 
-                if ancho_n != orden['ancho_fleje']:
-                    st.session_state.ordenes_editables[idx]['ancho_fleje'] = ancho_n
-                    st.session_state.ordenes_editables[idx]['desarrollo'] = ancho_n
-
-                    if ancho_n > 0 and cursor:
-                        cursor.execute("""
-                            SELECT peso_unitario, largo, espesor
-                            FROM ordenes 
-                            WHERE desarrollo = %s 
-                            LIMIT 1
-                        """, (ancho_n,))
-                        ref = cursor.fetchone()
+                if ancho_n != orden.ancho_fleje:
+                    orden.ancho_fleje = ancho_n
+                    orden.desarrollo = ancho_n
+                    presupuesto.actualizar(idx, cant_esta_orden, ancho_n)
+
+                    if ancho_n > 0:
+                        # Búsqueda en memoria: sin ida y vuelta a la base por cada cambio
+                        ref = referencias.indice_desarrollo().buscar(ancho_n, espesor=orden.espesor or None)
                         if ref:
-                            st.session_state.ordenes_editables[idx].update({
-                                'peso_unitario': float(ref['peso_unitario'] or 0),
-                                'largo': int(ref['largo'] or 0),
-                                'espesor': float(ref['espesor'] or 0)
-                            })
-                            st.success(f"✅ Peso: {float(ref['peso_unitario'] or 0):.4f} kg")
+                            orden.aplicar_referencia(ref)
+                            st.success(f"✅ Peso: {ref['peso_unitario']:.4f} kg")
                         else:
                             st.warning(f"⚠️ No se encontró referencia para desarrollo {ancho_n}mm")
 
             with col3:
-                dest = st.selectbox("Destino:", ["PLEGADO", "VENTA"], index=0 if orden['destino'] == 'PLEGADO' else 1, key=f"d_{idx}")
-                st.session_state.ordenes_editables[idx]['destino'] = dest
+                dest = st.selectbox("Destino:", ["PLEGADO", "VENTA"], index=0 if orden.destino == 'PLEGADO' else 1, key=f"d_{idx}")
+                orden.destino = dest
 
-            if orden['es_nueva'] and col4.button("🗑️", key=f"del_{idx}"):
+            if orden.es_nueva and col4.button("🗑️", key=f"del_{idx}"):
                 filas_a_eliminar.append(idx)
 
-            st.markdown(f"📝 **Descripción:** {orden.get('descrip_SAP', 'N/A')}")
+            st.markdown(f"📝 **Descripción:** {orden.descrip_SAP or 'N/A'}")
 
-            if orden.get('cod_SAP') or orden.get('cod_IBS'):
-                st.caption(f"Largo: {orden['largo']}mm | SAP: {orden['cod_SAP']} | IBS: {orden['cod_IBS']} | Orden: {orden['orden']}")
+            if orden.cod_SAP or orden.cod_IBS:
+                st.caption(f"Largo: {orden.largo}mm | SAP: {orden.cod_SAP} | IBS: {orden.cod_IBS} | Orden: {orden.orden}")
             else:
-                st.caption(f"Largo: {orden['largo']}mm | Sin códigos SAP/IBS | Orden: {orden['orden']}")
+                st.caption(f"Largo: {orden.largo}mm | Sin códigos SAP/IBS | Orden: {orden.orden}")
 
     for idx in sorted(filas_a_eliminar, reverse=True):
         st.session_state.ordenes_editables.pop(idx)
+        presupuesto.quitar(idx)
         st.rerun()
 
-    # ─────────────────────────────────────────────────────────────────────────
-    # BOTÓN AGREGAR: usa suma de áreas vs límite de área
-    # ─────────────────────────────────────────────────────────────────────────
-    puede_agregar = restante > 0
 
-    if st.button("➕ Agregar Nueva Orden", use_container_width=True, disabled=not puede_agregar):
-        agregar_nueva_orden(lote_padre, planchas_proc)
-        st.rerun()
+# ─────────────────────────────────────────────────────────────────────────────
+# MODO TABLA: todas las órdenes en un solo st.data_editor dentro de un form.
+# Los cambios no provocan reruns mientras se escriben; al presionar "Aplicar"
+# se toma el diff del editor (edited_rows), se valida contra el presupuesto de
+# área y se aplica completo o no se aplica.
+# ─────────────────────────────────────────────────────────────────────────────
 
-    if not puede_agregar:
-        st.warning("⚠️ No se pueden agregar más órdenes: el área total utilizada alcanzó el límite permitido.")
+COLUMNAS_GRILLA = {
+    'Cant. Cortada': 'cant_cortada',
+    'Ancho Fleje (mm)': 'ancho_fleje',
+    'Destino': 'destino',
+    'Eliminar': 'eliminar',
+}
 
-    mostrar_tabla_resumen()
+
+def _clave_grilla():
+    return f"grilla_ordenes_{st.session_state.get('grilla_version', 0)}"
+
+
+def mostrar_grilla_edicion(presupuesto):
+    ordenes = st.session_state.ordenes_editables
+    df = modelo_ordenes.a_dataframe(ordenes, {
+        'Lote': 'lote_completo',
+        'Cant. Cortada': 'cant_cortada',
+        'Ancho Fleje (mm)': 'ancho_fleje',
+        'Destino': 'destino',
+        'Largo': 'largo',
+        'Peso Unit.': 'peso_unitario',
+        'Descripción': 'descrip_SAP',
+    })
+    df.insert(3, 'Máx. Ancho', [presupuesto.max_ancho(i, o.cant_cortada) for i, o in enumerate(ordenes)])
+    df['Eliminar'] = False
+
+    with st.form("form_grilla_ordenes"):
+        st.data_editor(
+            df,
+            key=_clave_grilla(),
+            hide_index=True,
+            use_container_width=True,
+            num_rows="fixed",
+            disabled=['Lote', 'Máx. Ancho', 'Largo', 'Peso Unit.', 'Descripción'],
+            column_config={
+                'Cant. Cortada': st.column_config.NumberColumn(min_value=0, step=1),
+                'Ancho Fleje (mm)': st.column_config.NumberColumn(min_value=0, step=1),
+                'Destino': st.column_config.SelectboxColumn(options=["PLEGADO", "VENTA"], required=True),
+                'Peso Unit.': st.column_config.NumberColumn(format="%.4f"),
+                'Eliminar': st.column_config.CheckboxColumn(help="Solo aplica a órdenes nuevas"),
+            }
+        )
+        st.form_submit_button("💾 Aplicar cambios", use_container_width=True, on_click=aplicar_cambios_grilla)
+
+    for msg in st.session_state.pop('grilla_errores', []):
+        st.error(msg)
+
+
+def aplicar_cambios_grilla():
+    """Callback del form: corre antes del rerun, así el diff cuesta una sola ejecución."""
+    cambios = st.session_state.get(_clave_grilla(), {}).get('edited_rows', {})
+    if not cambios:
+        return
+
+    ordenes = st.session_state.ordenes_editables
+    presupuesto = obtener_presupuesto_area()
+
+    # Diff → nuevos valores por fila (sin tocar todavía la sesión)
+    nuevos = {}
+    for pos, valores in cambios.items():
+        i = int(pos)
+        fila = {campo: getattr(ordenes[i], campo) for campo in ('cant_cortada', 'ancho_fleje', 'destino')}
+        for col, valor in valores.items():
+            campo = COLUMNAS_GRILLA.get(col)
+            if campo in ('cant_cortada', 'ancho_fleje'):
+                fila[campo] = int(valor or 0)
+            elif campo:
+                fila[campo] = valor
+        nuevos[i] = fila
+
+    a_eliminar = sorted(
+        (i for i, f in nuevos.items() if f.get('eliminar') and ordenes[i].es_nueva),
+        reverse=True
+    )
+
+    # Validación sobre una copia del presupuesto con el lote completo aplicado
+    prueba = presupuesto.copiar()
+    for i, f in nuevos.items():
+        if i in a_eliminar:
+            prueba.actualizar(i, 0, 0)
+        else:
+            prueba.actualizar(i, f['cant_cortada'], f['ancho_fleje'])
+
+    # Cualquier fila cambiada puede pasar el límite (subir solo la cantidad
+    # también agranda el área). Si el lote deja el área total por encima del
+    # límite y más alta que antes, se rechaza y se nombran las filas que crecieron.
+    errores = []
+    if prueba.excedido and prueba.total > presupuesto.total:
+        for i, f in nuevos.items():
+            if i in a_eliminar or prueba.area(i) <= presupuesto.area(i):
+                continue
+            maximo = prueba.max_ancho(i, f['cant_cortada'])
+            errores.append(
+                f"{ordenes[i].lote_completo}: {f['cant_cortada']} × {f['ancho_fleje']} mm supera el área "
+                f"disponible (con esa cantidad, máximo {maximo} mm de ancho)"
+            )
+        errores = errores or [f"El área total ({prueba.total}) supera el límite ({prueba.limite})."]
+    if errores:
+        st.session_state.grilla_errores = ["⚠️ No se aplicaron los cambios."] + errores
+        return
+
+    # Aplicar todo de una vez
+    indice = None
+    for i, f in nuevos.items():
+        if i in a_eliminar:
+            continue
+        orden = ordenes[i]
+        if f['ancho_fleje'] != orden.ancho_fleje:
+            orden.ancho_fleje = f['ancho_fleje']
+            orden.desarrollo = f['ancho_fleje']
+            if f['ancho_fleje'] > 0:
+                indice = indice or referencias.indice_desarrollo()
+                ref = indice.buscar(f['ancho_fleje'], espesor=orden.espesor or None)
+                if ref:
+                    orden.aplicar_referencia(ref)
+        orden.cant_cortada = f['cant_cortada']
+        orden.destino = f['destino']
+        orden.peso_total = orden.cant_cortada * orden.peso_unitario
+        presupuesto.actualizar(i, orden.cant_cortada, orden.ancho_fleje)
+
+    for i in a_eliminar:
+        ordenes.pop(i)
+        presupuesto.quitar(i)
+
+    # Editor nuevo: el diff ya aplicado no debe volver a aplicarse
+    st.session_state.grilla_version = st.session_state.get('grilla_version', 0) + 1
+
+
+def obtener_presupuesto_area(limite=None):
+    """
+    PresupuestoArea de st.session_state.ordenes_editables. Se arma de nuevo solo
+    si no existe o quedó desalineado con las órdenes; un cambio de límite se
+    aplica directo.
+    """
+    ordenes = st.session_state.ordenes_editables
+    presupuesto = st.session_state.get('presupuesto_area')
+    if presupuesto is None or len(presupuesto) != len(ordenes):
+        presupuesto = calculos.PresupuestoArea(
+            limite or 0,
+            ((o.cant_cortada, o.ancho_fleje) for o in ordenes)
+        )
+        st.session_state.presupuesto_area = presupuesto
+    elif limite is not None:
+        presupuesto.limite = limite
+    return presupuesto
 
 
 def agregar_nueva_orden(lote_padre, planchas_proc):
     ordenes = st.session_state.ordenes_editables
-    nums = [int(o['lote_completo'].split('-')[-1]) for o in ordenes if '-' in o['lote_completo']]
+    nums = [int(o.lote_completo.split('-')[-1]) for o in ordenes if '-' in o.lote_completo]
     sig = max(nums) + 1 if nums else 1
     
-    st.session_state.ordenes_editables.append({
-        'lote_completo': f"{lote_padre}-{sig:02d}", 
-        'cant_cortada': 0, 
-        'ancho_fleje': 0,
-        'destino': 'VENTA', 
-        'largo': 0, 
-        'espesor': 0, 
-        'cod_SAP': '',
-        'cod_IBS': '',
-        'descrip_SAP': '', 
-        'peso_unitario': 0, 
-        'planchas_procesadas': planchas_proc,
-        'cant': 0, 
-        'can_total': 0, 
-        'orden': 0,
-        'desarrollo': 0,
-        'es_nueva': True
-    })
+    ordenes.append(modelo_ordenes.OrdenEditable(
+        lote_completo=f"{lote_padre}-{sig:02d}",
+        planchas_procesadas=planchas_proc,
+        es_nueva=True
+    ))
+    if 'presupuesto_area' in st.session_state:
+        st.session_state.presupuesto_area.agregar(0, 0)
 
 
 def mostrar_tabla_resumen():
     st.markdown("#### 📊 Resumen de Órdenes")
-    if st.session_state.ordenes_editables:
-        datos = []
-        for o in st.session_state.ordenes_editables:
-            fila = {
-                'Lote': o['lote_completo'], 
-                'Cant Cortada': o['cant_cortada'],
-                'Ancho Fleje': o['ancho_fleje'],
-                'Área (cant×ancho)': o['cant_cortada'] * o['ancho_fleje'],
-                'Flejes Pend.': o.get('can_total', 0),
-                'Destino': o['destino'],
-                'Peso Unit.': f"{o['peso_unitario']:.4f}", 
-                'Peso Total': f"{o.get('peso_total', 0):.4f}",
-                'Largo': o['largo']
+    ordenes = st.session_state.ordenes_editables
+    if ordenes:
+        presupuesto = obtener_presupuesto_area()
+        df = modelo_ordenes.a_dataframe(ordenes, {
+            'Lote': 'lote_completo',
+            'Cant Cortada': 'cant_cortada',
+            'Ancho Fleje': 'ancho_fleje',
+            'Flejes Pend.': 'can_total',
+            'Destino': 'destino',
+            'Peso Unit.': 'peso_unitario',
+            'Peso Total': 'peso_total',
+            'Largo': 'largo',
+        })
+        df.insert(3, 'Área (cant×ancho)', presupuesto.areas)
+
+        # SAP y Orden solo si alguna orden los tiene; vacíos en las demás
+        if any(o.cod_SAP for o in ordenes):
+            df['SAP'] = [o.cod_SAP or None for o in ordenes]
+        if any(o.orden for o in ordenes):
+            df['Orden'] = [o.orden or None for o in ordenes]
+
+        st.dataframe(
+            df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'Peso Unit.': st.column_config.NumberColumn(format="%.4f"),
+                'Peso Total': st.column_config.NumberColumn(format="%.4f"),
             }
-            
-            if o.get('cod_SAP'):
-                fila['SAP'] = o['cod_SAP']
-            if o.get('orden'):
-                fila['Orden'] = o['orden']
-                
-            datos.append(fila)
-        st.dataframe(pd.DataFrame(datos), use_container_width=True, hide_index=True)
+        )
+
+
+def insertar_tanda(conn, lote_p, planchas, maq_real, maq_programada, id_usuario, nombre_op, hora_inicio):
+    """
+    Crea en el servidor una fila de produccion 'procesando' por cada orden del
+    lote (INSERT ... SELECT): solo viajan los datos del operario y la máquina.
+    Devuelve la cantidad de filas creadas.
+    """
+    cursor = conn.ejecutar(
+        'insertar_tanda',
+        (id_usuario, planchas, maq_real, maq_programada, nombre_op, hora_inicio, lote_p)
+    )
+    return cursor.rowcount
 
 
 def iniciar_produccion(lote_p, planchas, maq_real, maq_programada):
     conn = get_connection()
+    if not conn:
+        st.error("❌ No hay conexión a la base de datos.")
+        return
     try:
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("SELECT * FROM ordenes WHERE lote_padre = %s ORDER BY lote_completo", (lote_p,))
-        todas_ordenes = cursor.fetchall()
-        
-        if not todas_ordenes:
-            st.error("❌ No se encontraron órdenes.")
-            return
-        
         nombre_op = st.session_state.usuario.get("nombre_usuario", "Operador")
         id_usuario = st.session_state.usuario["id"]
         hora_inicio_comun = datetime.now()
+
+        # Primero la reserva: el pendiente que se vio en pantalla puede haber
+        # cambiado si otro operario inició una tanda del mismo lote
+        if not saldo_lote.reservar(cursor, lote_p, planchas):
+            quedan = saldo_lote.disponible(cursor, lote_p) or 0
+            conn.rollback()
+            st.error(f"❌ Otro operario ya tomó esas planchas: quedan {max(quedan, 0)} pendientes en el lote.")
+            return
         
-        for o in todas_ordenes:
-            query = """
-                INSERT INTO produccion 
-                (lote_referencia, id_personal, planchas_procesadas, maquina_real, maq_proces, 
-                operador, hora_inicio, estado, orden, can_total, desarrollo, largo, espesor, 
-                peso_unitario, fecha_emision) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, 'procesando', %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(query, (
-                o['lote_completo'],
-                id_usuario, 
-                planchas, 
-                maq_real,
-                maq_programada,
-                nombre_op, 
-                hora_inicio_comun,
-                o['orden'], 
-                o['can_total'], 
-                o['desarrollo'], 
-                o['largo'], 
-                o['espesor'], 
-                o['peso_unitario'],
-                o['fecha_subida']
-            ))
+        creadas = insertar_tanda(conn, lote_p, planchas, maq_real, maq_programada,
+                                 id_usuario, nombre_op, hora_inicio_comun)
+        if not creadas:
+            conn.rollback()
+            st.error("❌ No se encontraron órdenes.")
+            return
         
         conn.commit()
-        st.success(f"✅ Producción iniciada: {len(todas_ordenes)} órdenes registradas.")
+        st.success(f"✅ Producción iniciada: {creadas} órdenes registradas.")
         st.rerun()
     except Exception as e:
         st.error(f"❌ Error al iniciar: {e}")
@@ -454,27 +532,24 @@ def iniciar_produccion(lote_p, planchas, maq_real, maq_programada):
         conn.close()
 
 
+def _actualizar_registros(conn, comunes, filas):
+    """
+    Cierra varias filas de produccion con un UPDATE preparado por bloque de
+    filas (src/utils.py: 'cerrar_produccion').
+    `comunes` = (hora_fin, lote_de_planchas, ancho_real, observacciones, tiempo_total)
+    `filas`   = [(id_registro, peso_total, cant_cortada_real, ancho_fleje_real,
+                  destino_real, merma, tiempo_ponderado), ...]
+    """
+    conn.ejecutar_filas('cerrar_produccion', filas, comunes)
+
+
 def finalizar_produccion(id_reg, lote_f, ancho_r, obs):
     """
     Actualiza registros existentes e INSERTA las nuevas órdenes agregadas.
     Calcula automáticamente merma y tiempo_ponderado por orden (invisible para el operario).
-
-    LÓGICA DE MERMA:
-    ─────────────────────────────────────────────────────────────────
-    1. area_orden      = cant_cortada × ancho_fleje          (por cada orden)
-    2. suma_areas      = Σ area_orden                        (todas las órdenes de la tanda)
-    3. area_plancha    = ancho_real × planchas_procesadas
-    4. diff            = area_plancha - suma_areas            (puede ser negativo)
-    5. merma_base_kg   = (diff × espesor × largo × 7.85) / 1_000_000
-                         (espesor y largo vienen del lote padre, un solo valor)
-    6. porcentaje      = (area_orden × 100) / suma_areas
-    7. merma_orden     = (porcentaje × merma_base_kg) / 100  (queda negativo si diff < 0)
-
-    LÓGICA DE TIEMPO PONDERADO:
-    ─────────────────────────────────────────────────────────────────
-    tiempo_ponderado   = tiempo_total_segundos × (porcentaje / 100)
-    Guardado en la misma columna tiempo_total como HH:MM:SS ponderado.
-    ─────────────────────────────────────────────────────────────────
+    El cálculo está en src/calculos.py (calcular_tanda) y se hace para todas las
+    órdenes de la tanda a la vez; las escrituras salen en sentencias multi-fila
+    dentro de una sola transacción.
     """
     if 'ordenes_editables' not in st.session_state:
         st.error("❌ Error: No se encontraron datos para guardar.")
@@ -484,12 +559,16 @@ def finalizar_produccion(id_reg, lote_f, ancho_r, obs):
     try:
         cursor = conn.cursor(dictionary=True)
         
-        # ── 1. Información base de la tanda ──────────────────────────────────────
+        # ── 1. Información base de la tanda + espesor y largo del lote padre ────
         cursor.execute("""
             SELECT o.lote_padre, p.hora_inicio, p.id_personal, p.planchas_procesadas,
-                   p.maquina_real, p.maq_proces, p.operador
+                   p.maquina_real, p.maq_proces, p.operador,
+                   ref.espesor AS espesor_lote, ref.largo AS largo_lote
             FROM produccion p
             INNER JOIN ordenes o ON p.lote_referencia = o.lote_completo
+            LEFT JOIN ordenes ref ON ref.lote_completo = (
+                SELECT MIN(o3.lote_completo) FROM ordenes o3 WHERE o3.lote_padre = o.lote_padre
+            )
             WHERE p.id_registro = %s
         """, (id_reg,))
         
@@ -505,131 +584,82 @@ def finalizar_produccion(id_reg, lote_f, ancho_r, obs):
         # ── 2. Tiempo total de la tanda (segundos) ────────────────────────────────
         diferencia      = h_fin - h_inicio
         total_segundos  = int(diferencia.total_seconds())
+        tiempo_total_str = calculos.segundos_a_hhmmss(total_segundos)
+
+        espesor_lote = float(info['espesor_lote'] or 0)
+        largo_lote   = float(info['largo_lote']   or 0)
+
+        # ── 3. Merma y tiempo ponderado de todas las órdenes editadas ────────────
+        editables = st.session_state.ordenes_editables
+        # El peso se recalcula aquí: en modo tabla las filas sin tocar no pasan por la pantalla
+        for o in editables:
+            o.peso_total = o.cant_cortada * o.peso_unitario
+        resultado = calculos.repartir_tanda(
+            obtener_presupuesto_area().areas,
+            ancho_r,
+            int(info['planchas_procesadas']),
+            espesor_lote,
+            largo_lote,
+            total_segundos
+        )
+        posicion = {o.lote_completo: i for i, o in enumerate(editables)}
 
-        def segundos_a_hhmmss(seg):
-            h, r = divmod(int(seg), 3600)
-            m, s = divmod(r, 60)
-            return f"{h:02d}:{m:02d}:{s:02d}"
-
-        tiempo_total_str = segundos_a_hhmmss(total_segundos)
-
-        # ── 3. Espesor y largo del lote padre (un solo valor) ─────────────────────
-        cursor.execute("""
-            SELECT espesor, largo
-            FROM ordenes
-            WHERE lote_padre = %s
-            LIMIT 1
-        """, (lote_padre,))
-        datos_lote = cursor.fetchone()
-
-        espesor_lote = float(datos_lote['espesor'] or 0) if datos_lote else 0.0
-        largo_lote   = float(datos_lote['largo']   or 0) if datos_lote else 0.0
+        def valores_orden(lote_c):
+            i = posicion.get(lote_c)
+            if i is None:
+                return modelo_ordenes.OrdenEditable(lote_c), 0.0, calculos.segundos_a_hhmmss(0)
+            return editables[i], resultado.merma(i), resultado.tiempo_ponderado(i)
 
-        # ── 4. Datos editados en sesión ───────────────────────────────────────────
-        datos_por_lote = {o['lote_completo']: o for o in st.session_state.ordenes_editables}
-        ordenes_nuevas = [o for o in st.session_state.ordenes_editables if o.get('es_nueva')]
+        def segundos_orden(lote_c):
+            i = posicion.get(lote_c)
+            return 0 if i is None else int(resultado.segundos_ponderados[i])
 
-        # ── 5. Calcular suma total de áreas (cant_cortada × ancho_fleje) ──────────
-        suma_areas = sum(
-            o.get('cant_cortada', 0) * o.get('ancho_fleje', 0)
-            for o in st.session_state.ordenes_editables
-        )
+        # Filas para los resúmenes diarios (src/resumenes.py)
+        filas_resumen = []
 
-        # ── 6. Área de plancha y merma base ───────────────────────────────────────
-        planchas_proc  = int(info['planchas_procesadas'])
-        area_plancha   = float(ancho_r) * float(planchas_proc)
-        diff           = area_plancha - suma_areas
-        merma_base_kg  = (diff * espesor_lote * largo_lote * 7.85) / 1_000_000
-
-        # ── 7. Función auxiliar: merma y tiempo ponderado para una orden ──────────
-        def calcular_merma_y_tiempo(cant_cortada, ancho_fleje):
-            area_orden = float(cant_cortada) * float(ancho_fleje)
-            if suma_areas > 0:
-                porcentaje = (area_orden * 100.0) / suma_areas
-            else:
-                porcentaje = 0.0
-            merma_orden     = (porcentaje * merma_base_kg) / 100.0
-            seg_ponderados  = total_segundos * (porcentaje / 100.0)
-            tiempo_pond_str = segundos_a_hhmmss(seg_ponderados)
-            return merma_orden, tiempo_pond_str
-
-        # ── 8. Registros activos en BD para este lote padre ───────────────────────
+        # ── 4. Registros activos en BD para este lote padre ───────────────────────
         cursor.execute("""
-            SELECT p.id_registro, p.lote_referencia
+            SELECT p.id_registro, p.lote_referencia, p.hora_inicio, p.id_personal,
+                   p.planchas_procesadas, p.maquina_real, p.operador
             FROM produccion p
             INNER JOIN ordenes o ON p.lote_referencia = o.lote_completo
             WHERE o.lote_padre = %s AND p.estado = 'procesando'
         """, (lote_padre,))
         registros_activos = cursor.fetchall()
 
-        # ── 9. ACTUALIZAR registros existentes ────────────────────────────────────
+        # ── 5. ACTUALIZAR registros existentes (un UPDATE multi-fila) ─────────────
+        filas_update = []
+        filas_detalle = []
         for reg in registros_activos:
-            lote_c = reg['lote_referencia']
-            edit   = datos_por_lote.get(lote_c, {})
-
-            cant_c    = edit.get('cant_cortada', 0)
-            ancho_f   = edit.get('ancho_fleje',  0)
-            merma_ord, tiempo_pond_str = calcular_merma_y_tiempo(cant_c, ancho_f)
-
-            query_update = """
-                UPDATE produccion 
-                SET hora_fin            = %s,
-                    estado              = 'finalizado',
-                    lote_de_planchas    = %s,
-                    ancho_real          = %s,
-                    observacciones      = %s,
-                    tiempo_total        = %s,
-                    peso_total          = %s,
-                    cant_cortada_real   = %s,
-                    ancho_fleje_real    = %s,
-                    destino_real        = %s,
-                    merma               = %s,
-                    tiempo_ponderado    = %s
-                WHERE id_registro = %s
-            """
-            cursor.execute(query_update, (
-                h_fin,
-                lote_f,
-                ancho_r,
-                obs,
-                tiempo_total_str,
-                edit.get('peso_total', 0),
-                cant_c,
-                ancho_f,
-                edit.get('destino', 'VENTA'),
-                round(merma_ord, 4),
-                tiempo_pond_str,
-                reg['id_registro']
-            ))
-
-            cursor.execute("""
+            edit, merma_ord, tiempo_pond_str = valores_orden(reg['lote_referencia'])
+            cant_c  = edit.cant_cortada
+            ancho_f = edit.ancho_fleje
+            destino = edit.destino
+            filas_update.append((reg['id_registro'], edit.peso_total, cant_c,
+                                 ancho_f, destino, merma_ord, tiempo_pond_str))
+            filas_detalle.append((reg['id_registro'], reg['lote_referencia'], cant_c, ancho_f, destino))
+            filas_resumen.append((reg['maquina_real'], reg['operador'], destino, cant_c, merma_ord,
+                                  segundos_orden(reg['lote_referencia'])))
+
+        if filas_update:
+            _actualizar_registros(conn, (h_fin, lote_f, ancho_r, obs, tiempo_total_str), filas_update)
+            cursor.executemany("""
                 INSERT INTO detalles_produccion 
                 (id_registro_produccion, lote_completo, cant_cortada_real, ancho_fleje_real, destino_real) 
                 VALUES (%s, %s, %s, %s, %s)
-            """, (reg['id_registro'], lote_c,
-                  edit.get('cant_cortada', 0),
-                  edit.get('ancho_fleje',  0),
-                  edit.get('destino', 'VENTA')))
+            """, filas_detalle)
 
-        # ── 10. INSERTAR órdenes nuevas ───────────────────────────────────────────
+        # ── 6. INSERTAR órdenes nuevas (un INSERT multi-fila) ────────────────────
+        ordenes_nuevas = [o for o in editables if o.es_nueva]
         if ordenes_nuevas:
+            filas_insert = []
             for nueva in ordenes_nuevas:
-                cant_c  = nueva.get('cant_cortada', 0)
-                ancho_f = nueva.get('ancho_fleje',  0)
-                merma_ord, tiempo_pond_str = calcular_merma_y_tiempo(cant_c, ancho_f)
-
-                query_insert = """
-                    INSERT INTO produccion 
-                    (lote_referencia, id_personal, planchas_procesadas, maquina_real, maq_proces, 
-                     operador, hora_inicio, hora_fin, estado, orden, can_total, desarrollo, largo, 
-                     espesor, peso_unitario, peso_total, lote_de_planchas, ancho_real, 
-                     observacciones, tiempo_total, cant_cortada_real, ancho_fleje_real,
-                     destino_real, merma, tiempo_ponderado) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'finalizado',
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(query_insert, (
-                    nueva['lote_completo'],
+                _, merma_ord, tiempo_pond_str = valores_orden(nueva.lote_completo)
+                filas_resumen.append((info['maquina_real'], info['operador'], nueva.destino,
+                                      nueva.cant_cortada, merma_ord,
+                                      segundos_orden(nueva.lote_completo)))
+                filas_insert.append((
+                    nueva.lote_completo,
                     info['id_personal'],
                     info['planchas_procesadas'],
                     info['maquina_real'],
@@ -637,35 +667,57 @@ def finalizar_produccion(id_reg, lote_f, ancho_r, obs):
                     info['operador'],
                     h_inicio,
                     h_fin,
-                    nueva.get('orden',         0),
-                    nueva.get('can_total',      0),
-                    nueva.get('desarrollo',     0),
-                    nueva.get('largo',          0),
-                    nueva.get('espesor',        0),
-                    nueva.get('peso_unitario',  0),
-                    nueva.get('peso_total',     0),
+                    nueva.orden,
+                    nueva.can_total,
+                    nueva.desarrollo,
+                    nueva.largo,
+                    nueva.espesor,
+                    nueva.peso_unitario,
+                    nueva.peso_total,
                     lote_f,
                     ancho_r,
                     obs,
                     tiempo_total_str,
-                    cant_c,
-                    ancho_f,
-                    nueva.get('destino', 'VENTA'),
-                    round(merma_ord, 4),
+                    nueva.cant_cortada,
+                    nueva.ancho_fleje,
+                    nueva.destino,
+                    merma_ord,
                     tiempo_pond_str
                 ))
 
-                cursor.execute("""
-                    INSERT INTO detalles_produccion 
-                    (id_registro_produccion, lote_completo, cant_cortada_real, ancho_fleje_real, destino_real) 
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (cursor.lastrowid, nueva['lote_completo'],
-                      cant_c, ancho_f, nueva.get('destino', 'VENTA')))
+            conn.ejecutar_filas('insertar_produccion', filas_insert)
+
+            # Los id_registro recién creados se toman de la propia tabla: la tanda
+            # se identifica por operario + hora_inicio
+            lotes_nuevos = [f[0] for f in filas_insert]
+            cursor.execute(f"""
+                INSERT INTO detalles_produccion 
+                (id_registro_produccion, lote_completo, cant_cortada_real, ancho_fleje_real, destino_real) 
+                SELECT id_registro, lote_referencia, cant_cortada_real, ancho_fleje_real, destino_real
+                FROM produccion
+                WHERE id_personal = %s AND hora_inicio = %s AND estado = 'finalizado'
+                  AND lote_referencia IN ({", ".join(["%s"] * len(lotes_nuevos))})
+            """, (info['id_personal'], h_inicio, *lotes_nuevos))
+
+        # ── 7. Saldo del lote: las tandas cerradas pasan a finalizado ────────────
+        tandas = {}
+        maquina_tanda = {}
+        for reg in registros_activos:
+            clave = (reg['hora_inicio'], reg['id_personal'])
+            tandas[clave] = max(tandas.get(clave, 0), int(reg['planchas_procesadas'] or 0))
+            maquina_tanda[clave] = (reg['maquina_real'], reg['operador'])
+        saldo_lote.pasar_a_finalizado(cursor, lote_padre, sum(tandas.values()))
+
+        # ── 8. Resúmenes diarios para la pantalla de análisis ────────────────────
+        resumenes.sumar_tanda(
+            cursor, h_fin.date(), filas_resumen,
+            [(*maquina_tanda[clave], planchas, total_segundos) for clave, planchas in tandas.items()]
+        )
 
         conn.commit()
 
-        # ── 11. Limpieza de session_state ─────────────────────────────────────────
-        for key in ['ordenes_editables', 'ancho_pl_lote', 'input_lote',
+        # ── 9. Limpieza de session_state ──────────────────────────────────────────
+        for key in ['ordenes_editables', 'presupuesto_area', 'ancho_pl_lote', 'input_lote',
                     'lote_fisico', 'ancho_real', 'observaciones']:
             if key in st.session_state:
                 del st.session_state[key]
@@ -677,4 +729,4 @@ def finalizar_produccion(id_reg, lote_f, ancho_r, obs):
         conn.rollback()
         st.error(f"❌ Error al guardar: {e}")
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
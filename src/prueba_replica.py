@@ -0,0 +1,90 @@
+import argparse
+import time
+from src import database
+from src.database import get_connection, en_sesion, estadisticas_pool
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PRUEBA DEL RUTEO DE LECTURAS A LA RÉPLICA
+# Contra dos instancias MySQL locales, p. ej. primario en 3306 y réplica en
+# 3307 (con replicación o sin ella: se reconocen por @@server_id):
+#
+#   DB_HOST=127.0.0.1 DB_PORT=3306 DB_REPLICA_HOST=127.0.0.1 DB_REPLICA_PORT=3307 \
+#       python -m src.prueba_replica [--ventana 2]
+#
+# Verifica que una lectura vaya a la réplica, que después de un commit de la
+# sesión vaya al primario durante la ventana y que pasada la ventana vuelva a
+# la réplica. Con la réplica detenida, verifica que se use el primario.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _servidor(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT @@server_id, @@port")
+    return tuple(cursor.fetchone())
+
+
+def _leer_desde():
+    conn = get_connection(solo_lectura=True)
+    if not conn:
+        raise SystemExit("✘ Sin conexión para leer.")
+    try:
+        return _servidor(conn), conn.solo_lectura
+    finally:
+        conn.close()
+
+
+def probar(ventana):
+    database.VENTANA_LECTURA_SEG = ventana
+    conn = get_connection()
+    if not conn:
+        raise SystemExit("✘ Sin conexión al primario.")
+    try:
+        primario = _servidor(conn)
+    finally:
+        conn.close()
+    print(f"Primario: server_id={primario[0]} puerto={primario[1]}")
+
+    sesion = {}
+    with en_sesion(sesion):
+        servidor, de_replica = _leer_desde()
+        if not de_replica:
+            print("Réplica no disponible: la lectura fue al primario.")
+            if servidor != primario:
+                raise SystemExit("✘ La lectura de respaldo no fue al primario.")
+            print("✔ Respaldo al primario.")
+            return
+        print(f"Réplica:  server_id={servidor[0]} puerto={servidor[1]}")
+        if servidor == primario:
+            print("⚠️ La réplica responde con el mismo server_id y puerto que el primario.")
+
+        conn = get_connection()
+        try:
+            conn.commit()  # cualquier commit de la sesión abre la ventana
+        finally:
+            conn.close()
+        servidor, de_replica = _leer_desde()
+        if de_replica or servidor != primario:
+            raise SystemExit("✘ Después de escribir, la lectura no fue al primario.")
+        print(f"✔ Dentro de la ventana ({ventana}s) se lee del primario.")
+
+        time.sleep(ventana + 0.1)
+        _, de_replica = _leer_desde()
+        if not de_replica:
+            raise SystemExit("✘ Pasada la ventana, la lectura no volvió a la réplica.")
+        print("✔ Pasada la ventana se vuelve a leer de la réplica.")
+
+    _, de_replica = _leer_desde()
+    if not de_replica:
+        raise SystemExit("✘ Sin sesión, la lectura no fue a la réplica.")
+    print("✔ Lecturas sin sesión van a la réplica.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ruteo de lecturas entre primario y réplica")
+    parser.add_argument("--ventana", type=float, default=2.0, help="segundos de lectura en el primario tras escribir")
+    args = parser.parse_args()
+
+    if not database.replica_configurada():
+        raise SystemExit("Definir DB_REPLICA_HOST (y DB_REPLICA_PORT) con el motor MySQL.")
+    probar(args.ventana)
+    print(estadisticas_pool())
@@ -0,0 +1,117 @@
+import os
+import time
+from src.cache import CacheTTL
+from src.database import get_connection, VENTANA_LECTURA_SEG
+
+# ─────────────────────────────────────────────────────────────────────────────
+# DATOS DE REFERENCIA
+# Listas que solo cambian cuando el supervisor sube un plan nuevo. Se guardan
+# en una caché del proceso y procesar_y_guardar la invalida al hacer commit.
+#   REF_CACHE_TTL  → segundos de vida de cada entrada (por si otro proceso
+#                    escribe en la base sin pasar por esta app)
+# Se leen de la réplica, salvo justo después de invalidar: la carga nueva
+# podría llegar antes que la replicación y quedar en caché hasta el TTL.
+# ─────────────────────────────────────────────────────────────────────────────
+
+cache_referencias = CacheTTL(
+    max_entradas=int(os.getenv("REF_CACHE_MAX", 128)),
+    ttl=float(os.getenv("REF_CACHE_TTL", 600))
+)
+
+
+_invalidada = None
+
+
+def _consultar(conn, query, params=()):
+    propia = conn is None
+    if propia:
+        recien_invalidada = _invalidada is not None and time.monotonic() - _invalidada < VENTANA_LECTURA_SEG
+        conn = get_connection(solo_lectura=not recien_invalidada)
+        if not conn:
+            raise RuntimeError("No hay conexión a la base de datos.")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        if propia:
+            conn.close()
+
+
+def listar_maquinas(conn=None):
+    """Nombres de máquina distintos de ordenes, ordenados."""
+    def cargar():
+        filas = _consultar(conn, """
+            SELECT DISTINCT nombre_maquina FROM ordenes
+            WHERE nombre_maquina IS NOT NULL
+            ORDER BY nombre_maquina
+        """)
+        return tuple(f[0] for f in filas)
+
+    return list(cache_referencias.obtener('maquinas', cargar))
+
+
+def invalidar():
+    """Llamar después de cualquier commit que cambie ordenes."""
+    global _invalidada
+    _invalidada = time.monotonic()
+    cache_referencias.invalidar()
+
+
+def estadisticas():
+    return cache_referencias.estadisticas()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# ÍNDICE desarrollo → peso_unitario / largo / espesor
+# Reemplaza el SELECT ... WHERE desarrollo = %s LIMIT 1 que se hacía en cada
+# cambio de ancho en la tabla de edición. Se arma una sola vez por proceso
+# (y de nuevo después de cada carga del supervisor).
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _clave_espesor(espesor):
+    return round(float(espesor), 2) if espesor is not None else None
+
+
+class IndiceDesarrollo:
+    def __init__(self, filas):
+        """`filas`: (desarrollo, espesor, calidad, peso_unitario, largo)."""
+        self._datos = {}
+        for desarrollo, espesor, calidad, peso_unitario, largo in filas:
+            d = int(desarrollo)
+            e = _clave_espesor(espesor)
+            ref = {
+                'peso_unitario': float(peso_unitario or 0),
+                'largo': int(largo or 0),
+                'espesor': float(espesor or 0),
+            }
+            # La primera fila encontrada gana, igual que el LIMIT 1 original
+            self._datos.setdefault((d,), ref)
+            self._datos.setdefault((d, e), ref)
+            self._datos.setdefault((d, e, calidad), ref)
+
+    def buscar(self, desarrollo, espesor=None, calidad=None):
+        """Referencia más específica disponible, o None si el desarrollo no existe."""
+        d = int(desarrollo)
+        if espesor is not None:
+            e = _clave_espesor(espesor)
+            if calidad is not None and (d, e, calidad) in self._datos:
+                return self._datos[(d, e, calidad)]
+            if (d, e) in self._datos:
+                return self._datos[(d, e)]
+        return self._datos.get((d,))
+
+    def __len__(self):
+        return sum(1 for k in self._datos if len(k) == 1)
+
+
+def indice_desarrollo(conn=None):
+    def cargar():
+        filas = _consultar(conn, """
+            SELECT desarrollo, espesor, calidad, peso_unitario, largo
+            FROM ordenes
+            WHERE desarrollo IS NOT NULL
+        """)
+        return IndiceDesarrollo(filas)
+
+    return cache_referencias.obtener('indice_desarrollo', cargar)
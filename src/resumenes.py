@@ -0,0 +1,212 @@
+import argparse
+from datetime import date, timedelta
+from src.database import get_connection
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RESÚMENES DIARIOS DE PRODUCCIÓN
+# Totales ya agregados para la pantalla de análisis del supervisor, que así no
+# recorre produccion (ni compite con los operarios que escriben en ella).
+#
+#   resumen_ordenes_dia  (día × máquina × operador × destino)
+#       ordenes, cant_cortada, merma_kg, segundos_ponderados
+#   resumen_tandas_dia   (día × máquina × operador)
+#       tandas, planchas, segundos
+#
+# día = DATE(hora_fin). finalizar_produccion suma cada tanda en su misma
+# transacción (sumar_tanda); reconstruir() los arma desde la historia.
+#
+#   python -m src.resumenes reconstruir [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+# ─────────────────────────────────────────────────────────────────────────────
+
+DDL_RESUMENES = [
+    """
+    CREATE TABLE IF NOT EXISTS resumen_ordenes_dia (
+        dia                  DATE NOT NULL,
+        maquina              VARCHAR(100) NOT NULL DEFAULT '',
+        operador             VARCHAR(100) NOT NULL DEFAULT '',
+        destino              VARCHAR(20) NOT NULL DEFAULT '',
+        ordenes              INT NOT NULL DEFAULT 0,
+        cant_cortada         BIGINT NOT NULL DEFAULT 0,
+        merma_kg             DECIMAL(16,4) NOT NULL DEFAULT 0,
+        segundos_ponderados  BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, maquina, operador, destino)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS resumen_tandas_dia (
+        dia       DATE NOT NULL,
+        maquina   VARCHAR(100) NOT NULL DEFAULT '',
+        operador  VARCHAR(100) NOT NULL DEFAULT '',
+        tandas    INT NOT NULL DEFAULT 0,
+        planchas  BIGINT NOT NULL DEFAULT 0,
+        segundos  BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, maquina, operador)
+    )
+    """,
+]
+
+QUERY_SUMAR_ORDENES = """
+    INSERT INTO resumen_ordenes_dia
+        (dia, maquina, operador, destino, ordenes, cant_cortada, merma_kg, segundos_ponderados)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        ordenes             = ordenes + VALUES(ordenes),
+        cant_cortada        = cant_cortada + VALUES(cant_cortada),
+        merma_kg            = merma_kg + VALUES(merma_kg),
+        segundos_ponderados = segundos_ponderados + VALUES(segundos_ponderados)
+"""
+
+QUERY_SUMAR_TANDAS = """
+    INSERT INTO resumen_tandas_dia (dia, maquina, operador, tandas, planchas, segundos)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        tandas   = tandas + VALUES(tandas),
+        planchas = planchas + VALUES(planchas),
+        segundos = segundos + VALUES(segundos)
+"""
+
+# {filtro} se reemplaza por el rango de fechas o queda vacío
+QUERY_CALCULO_ORDENES = """
+    INSERT INTO resumen_ordenes_dia
+        (dia, maquina, operador, destino, ordenes, cant_cortada, merma_kg, segundos_ponderados)
+    SELECT DATE(hora_fin),
+           IFNULL(maquina_real, ''),
+           IFNULL(operador, ''),
+           IFNULL(destino_real, ''),
+           COUNT(*),
+           SUM(IFNULL(cant_cortada_real, 0)),
+           SUM(IFNULL(merma, 0)),
+           SUM(IFNULL(TIME_TO_SEC(tiempo_ponderado), 0))
+    FROM produccion
+    WHERE estado = 'finalizado' AND hora_fin IS NOT NULL {filtro}
+    GROUP BY DATE(hora_fin), IFNULL(maquina_real, ''), IFNULL(operador, ''), IFNULL(destino_real, '')
+"""
+
+# Una tanda = filas de produccion con el mismo hora_inicio e id_personal
+QUERY_CALCULO_TANDAS = """
+    INSERT INTO resumen_tandas_dia (dia, maquina, operador, tandas, planchas, segundos)
+    SELECT tanda.dia, tanda.maquina, tanda.operador, COUNT(*), SUM(tanda.planchas), SUM(tanda.segundos)
+    FROM (
+        SELECT DATE(hora_fin) AS dia,
+               IFNULL(maquina_real, '') AS maquina,
+               IFNULL(operador, '') AS operador,
+               MAX(planchas_procesadas) AS planchas,
+               MAX(IFNULL(TIME_TO_SEC(tiempo_total), 0)) AS segundos
+        FROM produccion
+        WHERE estado = 'finalizado' AND hora_fin IS NOT NULL {filtro}
+        GROUP BY DATE(hora_fin), IFNULL(maquina_real, ''), IFNULL(operador, ''), hora_inicio, id_personal
+    ) tanda
+    GROUP BY tanda.dia, tanda.maquina, tanda.operador
+"""
+
+DIMENSIONES_ORDENES = ('dia', 'maquina', 'operador', 'destino')
+DIMENSIONES_TANDAS = ('dia', 'maquina', 'operador')
+
+
+def crear_tablas(cursor):
+    for ddl in DDL_RESUMENES:
+        cursor.execute(ddl)
+
+
+def sumar_tanda(cursor, dia, filas_ordenes, filas_tandas):
+    """
+    Suma una tanda finalizada a los resúmenes. No hace commit.
+      filas_ordenes: (maquina, operador, destino, cant_cortada, merma_kg, segundos_ponderados)
+      filas_tandas:  (maquina, operador, planchas, segundos)
+    """
+    ordenes = {}
+    for maquina, operador, destino, cant, merma, segundos in filas_ordenes:
+        clave = (maquina or '', operador or '', destino or '')
+        acc = ordenes.setdefault(clave, [0, 0, 0.0, 0])
+        acc[0] += 1
+        acc[1] += int(cant or 0)
+        acc[2] += float(merma or 0)
+        acc[3] += int(segundos or 0)
+    if ordenes:
+        cursor.executemany(QUERY_SUMAR_ORDENES, [
+            (dia, *clave, acc[0], acc[1], round(acc[2], 4), acc[3]) for clave, acc in ordenes.items()
+        ])
+
+    tandas = {}
+    for maquina, operador, planchas, segundos in filas_tandas:
+        acc = tandas.setdefault((maquina or '', operador or ''), [0, 0, 0])
+        acc[0] += 1
+        acc[1] += int(planchas or 0)
+        acc[2] += int(segundos or 0)
+    if tandas:
+        cursor.executemany(QUERY_SUMAR_TANDAS, [(dia, *clave, *acc) for clave, acc in tandas.items()])
+
+
+def reconstruir(cursor, desde=None, hasta=None):
+    """Borra y recalcula los días [desde, hasta] (o toda la historia). No hace commit."""
+    condiciones, params = [], []
+    if desde:
+        condiciones.append("dia >= %s")
+        params.append(desde)
+    if hasta:
+        condiciones.append("dia <= %s")
+        params.append(hasta)
+    where = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+    for tabla in ('resumen_ordenes_dia', 'resumen_tandas_dia'):
+        cursor.execute(f"DELETE FROM {tabla}{where}", params)
+
+    # Sobre hora_fin (no DATE(hora_fin)) para que el filtro pueda usar índice
+    filtro, params = "", []
+    if desde:
+        filtro += " AND hora_fin >= %s"
+        params.append(desde)
+    if hasta:
+        filtro += " AND hora_fin < %s"
+        params.append(hasta + timedelta(days=1))
+    cursor.execute(QUERY_CALCULO_ORDENES.format(filtro=filtro), params)
+    cursor.execute(QUERY_CALCULO_TANDAS.format(filtro=filtro), params)
+
+
+def _consultar(conn, tabla, metricas, dimensiones, validas, desde, hasta):
+    dimensiones = [d for d in dimensiones if d in validas]
+    columnas = ", ".join(dimensiones)
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(f"""
+        SELECT {columnas + ', ' if columnas else ''}{metricas}
+        FROM {tabla}
+        WHERE dia BETWEEN %s AND %s
+        {'GROUP BY ' + columnas if columnas else ''}
+        {'ORDER BY ' + columnas if columnas else ''}
+    """, (desde, hasta))
+    return cursor.fetchall()
+
+
+def consultar_ordenes(conn, desde, hasta, dimensiones=DIMENSIONES_ORDENES):
+    return _consultar(conn, 'resumen_ordenes_dia', """
+        SUM(ordenes) AS ordenes,
+        SUM(cant_cortada) AS cant_cortada,
+        SUM(merma_kg) AS merma_kg,
+        SUM(segundos_ponderados) AS segundos_ponderados
+    """, dimensiones, DIMENSIONES_ORDENES, desde, hasta)
+
+
+def consultar_tandas(conn, desde, hasta, dimensiones=DIMENSIONES_TANDAS):
+    return _consultar(conn, 'resumen_tandas_dia', """
+        SUM(tandas) AS tandas,
+        SUM(planchas) AS planchas,
+        SUM(segundos) AS segundos
+    """, dimensiones, DIMENSIONES_TANDAS, desde, hasta)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resúmenes diarios de producción")
+    parser.add_argument("accion", choices=["reconstruir"])
+    parser.add_argument("--desde", type=date.fromisoformat)
+    parser.add_argument("--hasta", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    conn = get_connection()
+    if not conn:
+        raise SystemExit(1)
+    try:
+        reconstruir(conn.cursor(), args.desde, args.hasta)
+        conn.commit()
+        rango = f"{args.desde or 'inicio'} → {args.hasta or 'hoy'}"
+        print(f"Resúmenes reconstruidos ({rango}).")
+    finally:
+        conn.close()
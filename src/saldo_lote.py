@@ -0,0 +1,241 @@
+import argparse
+from src.database import get_connection
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SALDO POR LOTE PADRE
+# Resumen meta / finalizado / en_proceso de cada lote_padre, mantenido de forma
+# incremental por iniciar_produccion y finalizar_produccion (en su misma
+# transacción). Reemplaza la consulta con subconsultas correlacionadas que se
+# corría en cada rerun de la pantalla del operario.
+#
+#   meta        = MAX(ordenes.cantidad_planchas) del lote
+#   finalizado  = Σ planchas de cada tanda finalizada
+#   en_proceso  = Σ planchas de cada tanda procesando
+#   (una tanda = filas de produccion con el mismo hora_inicio e id_personal)
+#
+# `version` sube con cada cambio; sirve para saber si el lote cambió.
+#
+# RESERVA DE PLANCHAS
+# Varios operarios pueden iniciar tandas del mismo lote a la vez. reservar()
+# suma a en_proceso con un UPDATE condicional (solo si meta - finalizado -
+# en_proceso alcanza): la comprobación y la suma son una sola sentencia sobre
+# la fila del lote, así que dos operarios no pueden tomar las mismas últimas
+# planchas y no hace falta bloquear tablas. El bloqueo de fila dura hasta el
+# commit de iniciar_produccion; lotes distintos no se esperan entre sí.
+# Simulación con muchos operarios: python -m src.simulacion_reservas
+# ─────────────────────────────────────────────────────────────────────────────
+
+DDL_SALDO_LOTE = """
+    CREATE TABLE IF NOT EXISTS saldo_lote (
+        lote_padre   VARCHAR(50) NOT NULL,
+        meta         INT NOT NULL DEFAULT 0,
+        finalizado   INT NOT NULL DEFAULT 0,
+        en_proceso   INT NOT NULL DEFAULT 0,
+        version      INT NOT NULL DEFAULT 0,
+        actualizado  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (lote_padre)
+    )
+"""
+
+# Cálculo desde cero (misma lógica que la antigua query_saldo). {filtro_o} y
+# {filtro_o2} se reemplazan por el filtro de lotes o quedan vacíos.
+QUERY_CALCULO = """
+    SELECT m.lote_padre,
+           m.meta,
+           IFNULL(t.finalizado, 0) AS finalizado,
+           IFNULL(t.en_proceso, 0) AS en_proceso
+    FROM (
+        SELECT lote_padre, MAX(cantidad_planchas) AS meta
+        FROM ordenes
+        {filtro_o}
+        GROUP BY lote_padre
+    ) m
+    LEFT JOIN (
+        SELECT tanda.lote_padre,
+               SUM(CASE WHEN tanda.estado = 'finalizado' THEN tanda.planchas ELSE 0 END) AS finalizado,
+               SUM(CASE WHEN tanda.estado = 'procesando' THEN tanda.planchas ELSE 0 END) AS en_proceso
+        FROM (
+            SELECT o2.lote_padre, p.estado, MAX(p.planchas_procesadas) AS planchas
+            FROM produccion p
+            INNER JOIN ordenes o2 ON p.lote_referencia = o2.lote_completo
+            WHERE p.estado IN ('finalizado', 'procesando') {filtro_o2}
+            GROUP BY o2.lote_padre, p.estado, p.hora_inicio, p.id_personal
+        ) tanda
+        GROUP BY tanda.lote_padre
+    ) t ON t.lote_padre = m.lote_padre
+"""
+
+
+def _consulta_calculo(lotes=None):
+    if not lotes:
+        return QUERY_CALCULO.format(filtro_o="", filtro_o2=""), ()
+    lotes = list(lotes)
+    marcadores = ", ".join(["%s"] * len(lotes))
+    query = QUERY_CALCULO.format(
+        filtro_o=f"WHERE lote_padre IN ({marcadores})",
+        filtro_o2=f"AND o2.lote_padre IN ({marcadores})"
+    )
+    return query, tuple(lotes) * 2
+
+
+def crear_tabla(cursor):
+    cursor.execute(DDL_SALDO_LOTE)
+
+
+def reconstruir(cursor, lotes=None):
+    """Recalcula desde cero el saldo de `lotes` (o de todos). No hace commit."""
+    calculo, params = _consulta_calculo(lotes)
+    cursor.execute(f"""
+        INSERT INTO saldo_lote (lote_padre, meta, finalizado, en_proceso)
+        SELECT calc.lote_padre, calc.meta, calc.finalizado, calc.en_proceso
+        FROM ({calculo}) calc
+        ON DUPLICATE KEY UPDATE
+            meta       = VALUES(meta),
+            finalizado = VALUES(finalizado),
+            en_proceso = VALUES(en_proceso),
+            version    = version + 1
+    """, params)
+
+
+def verificar(cursor, lotes=None):
+    """
+    Compara el saldo guardado con el recalculado. Devuelve la lista de lotes
+    con diferencias como (lote_padre, guardado, calculado).
+    """
+    calculo, params = _consulta_calculo(lotes)
+    cursor.execute(f"""
+        SELECT calc.lote_padre, calc.meta, calc.finalizado, calc.en_proceso,
+               s.meta AS s_meta, s.finalizado AS s_finalizado, s.en_proceso AS s_en_proceso
+        FROM ({calculo}) calc
+        LEFT JOIN saldo_lote s ON s.lote_padre = calc.lote_padre
+    """, params)
+    nombres = [d[0] for d in cursor.description]
+    diferencias = []
+    for fila in cursor.fetchall():
+        if not isinstance(fila, dict):
+            fila = dict(zip(nombres, fila))
+        calculado = tuple(int(fila[c] or 0) for c in ('meta', 'finalizado', 'en_proceso'))
+        guardado = None if fila['s_meta'] is None else tuple(
+            int(fila[c] or 0) for c in ('s_meta', 's_finalizado', 's_en_proceso')
+        )
+        if guardado != calculado:
+            diferencias.append((fila['lote_padre'], guardado, calculado))
+    return diferencias
+
+
+def reservar(cursor, lote_padre, planchas):
+    """
+    Pasa `planchas` a en_proceso si el lote todavía las tiene pendientes.
+    Devuelve True si se reservaron. Si el lote aún no tiene saldo, se calcula
+    completo y se reintenta una vez. No hace commit.
+    """
+    for _ in range(2):
+        cursor.execute("""
+            UPDATE saldo_lote
+            SET en_proceso = en_proceso + %s,
+                version    = version + 1
+            WHERE lote_padre = %s
+              AND meta - finalizado - en_proceso >= %s
+        """, (planchas, lote_padre, planchas))
+        if cursor.rowcount > 0:
+            return True
+        if disponible(cursor, lote_padre) is not None:
+            return False
+        reconstruir(cursor, [lote_padre])
+    return False
+
+
+def disponible(cursor, lote_padre):
+    """Planchas pendientes sin reservar (None si el lote no tiene saldo)."""
+    cursor.execute(
+        "SELECT meta - finalizado - en_proceso FROM saldo_lote WHERE lote_padre = %s",
+        (lote_padre,)
+    )
+    fila = cursor.fetchone()
+    if fila is None:
+        return None
+    return int(list(fila.values())[0] if isinstance(fila, dict) else fila[0])
+
+
+def pasar_a_finalizado(cursor, lote_padre, planchas):
+    """Tandas que terminaron: sus planchas pasan de en_proceso a finalizado."""
+    cursor.execute("""
+        UPDATE saldo_lote
+        SET finalizado = finalizado + %s,
+            en_proceso = GREATEST(en_proceso - %s, 0),
+            version    = version + 1
+        WHERE lote_padre = %s
+    """, (planchas, planchas, lote_padre))
+    if cursor.rowcount == 0:
+        reconstruir(cursor, [lote_padre])
+
+
+def calcular(cursor, lote_padre):
+    """
+    Saldo del lote recalculado sin guardarlo (dict con meta, finalizado,
+    en_proceso y version=None), o None si el lote no tiene órdenes. Sirve
+    con conexiones de solo lectura.
+    """
+    calculo, params = _consulta_calculo([lote_padre])
+    cursor.execute(calculo, params)
+    fila = cursor.fetchone()
+    if fila is None:
+        return None
+    valores = list(fila.values()) if isinstance(fila, dict) else list(fila)
+    return {
+        'lote_padre': valores[0],
+        'meta': valores[1],
+        'finalizado': valores[2],
+        'en_proceso': valores[3],
+        'version': None,
+    }
+
+
+def obtener(conn, lote_padre):
+    """
+    Fila de saldo del lote (dict con meta, finalizado, en_proceso, version) o
+    None si el lote no tiene órdenes. Un lote que todavía no está en la tabla
+    se calcula y se guarda en ese momento.
+    """
+    cursor = conn.cursor(dictionary=True)
+    query = """
+        SELECT lote_padre, meta, finalizado, en_proceso, version
+        FROM saldo_lote
+        WHERE lote_padre = %s
+    """
+    cursor.execute(query, (lote_padre,))
+    fila = cursor.fetchone()
+    if fila is None:
+        reconstruir(cursor, [lote_padre])
+        conn.commit()
+        cursor.execute(query, (lote_padre,))
+        fila = cursor.fetchone()
+    return fila
+
+
+# Mantenimiento: python -m src.saldo_lote {reconstruir,verificar} [lote ...]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de la tabla saldo_lote")
+    parser.add_argument("accion", choices=["reconstruir", "verificar"])
+    parser.add_argument("lotes", nargs="*", help="lote_padre a procesar (todos si se omite)")
+    args = parser.parse_args()
+
+    conn = get_connection()
+    if not conn:
+        raise SystemExit(1)
+    try:
+        cursor = conn.cursor()
+        crear_tabla(cursor)
+        if args.accion == "reconstruir":
+            reconstruir(cursor, args.lotes)
+            conn.commit()
+            print("Saldo reconstruido.")
+        else:
+            diferencias = verificar(cursor, args.lotes)
+            for lote, guardado, calculado in diferencias:
+                print(f"{lote}: guardado={guardado} calculado={calculado}")
+            print(f"{len(diferencias)} lote(s) con diferencias.")
+            if diferencias:
+                raise SystemExit(2)
+    finally:
+        conn.close()
@@ -0,0 +1,164 @@
+import argparse
+import statistics
+import threading
+import time
+from src.database import get_connection, obtener_pool, es_sqlite
+from src import saldo_lote
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SIMULACIÓN DE OPERARIOS CONCURRENTES SOBRE UN LOTE
+# Crea un lote de prueba en saldo_lote con `meta` planchas y lanza N hilos que
+# reservan de a `planchas` (cada reserva en su propia conexión y transacción,
+# como un rerun de iniciar_produccion) hasta que el lote se agota. Verifica
+# que lo reservado nunca pase la meta y compara reservas/s contra un solo
+# operario. Con --ingenuo usa el esquema anterior (leer pendiente y después
+# sumar) para mostrar la sobre-asignación que evita saldo_lote.reservar.
+#
+# Cada escenario se corre --repeticiones veces y se comparan las medianas:
+# una corrida suelta varía mucho con la carga de la máquina.
+#
+#   python -m src.simulacion_reservas [--operarios 20] [--meta 500] [--planchas 1]
+#                                     [--repeticiones 3] [--tolerancia 0.5]
+# Se puede correr contra la base embebida: DB_MOTOR=sqlite DB_SQLITE_RUTA=...
+# SQLite bloquea la base entera en cada escritura, así que ahí la comparación
+# de rendimiento solo se informa; la de bloqueos por fila se verifica en MySQL.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _reservar_ingenuo(cursor, lote_padre, planchas):
+    pendiente = saldo_lote.disponible(cursor, lote_padre)
+    if pendiente is None or pendiente < planchas:
+        return False
+    time.sleep(0.001)  # la pantalla y el clic en "Iniciar" nunca son simultáneos
+    cursor.execute("""
+        UPDATE saldo_lote SET en_proceso = en_proceso + %s, version = version + 1
+        WHERE lote_padre = %s
+    """, (planchas, lote_padre))
+    return True
+
+
+MAX_ERRORES_SEGUIDOS = 5
+
+
+def _operario(lote_padre, planchas, reservar, resultado, lock):
+    hechas = 0
+    seguidos = 0
+    while seguidos < MAX_ERRORES_SEGUIDOS:
+        conn = get_connection(timeout=30)
+        if not conn:
+            break
+        try:
+            ok = reservar(conn.cursor(), lote_padre, planchas)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            with lock:
+                resultado['errores'] += 1
+                resultado['ultimo_error'] = str(e)
+            # Un bloqueo pasajero se reintenta; un error que se repite corta al operario
+            seguidos += 1
+            continue
+        finally:
+            conn.close()
+        if not ok:
+            break
+        seguidos = 0
+        hechas += 1
+    with lock:
+        resultado['reservas'] += hechas
+
+
+def simular(operarios, meta, planchas, ingenuo=False):
+    lote = f"SIM-{int(time.time() * 1000)}"
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO saldo_lote (lote_padre, meta, finalizado, en_proceso) VALUES (%s, %s, 0, 0)",
+        (lote, meta)
+    )
+    conn.commit()
+    conn.close()
+
+    reservar = _reservar_ingenuo if ingenuo else saldo_lote.reservar
+    resultado = {'reservas': 0, 'errores': 0, 'ultimo_error': None}
+    lock = threading.Lock()
+    hilos = [
+        threading.Thread(target=_operario, args=(lote, planchas, reservar, resultado, lock))
+        for _ in range(operarios)
+    ]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    segundos = time.perf_counter() - inicio
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT en_proceso FROM saldo_lote WHERE lote_padre = %s", (lote,))
+        en_proceso = int(cursor.fetchone()[0])
+        cursor.execute("DELETE FROM saldo_lote WHERE lote_padre = %s", (lote,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        'operarios': operarios,
+        'reservas': resultado['reservas'],
+        'planchas_reservadas': en_proceso,
+        'meta': meta,
+        'sobre_asignadas': max(en_proceso - meta, 0),
+        'errores': resultado['errores'],
+        'ultimo_error': resultado['ultimo_error'],
+        'segundos': round(segundos, 3),
+        'reservas_por_seg': round(resultado['reservas'] / segundos, 1) if segundos else None,
+    }
+
+
+def _mediana(corridas):
+    valores = [r['reservas_por_seg'] for r in corridas if r['reservas_por_seg']]
+    return statistics.median(valores) if valores else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Operarios concurrentes reservando planchas de un lote")
+    parser.add_argument("--operarios", type=int, default=20)
+    parser.add_argument("--meta", type=int, default=500)
+    parser.add_argument("--planchas", type=int, default=1)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--tolerancia", type=float, default=0.5,
+                        help="falla si la mediana con concurrencia baja de esta fracción de la de un operario")
+    parser.add_argument("--ingenuo", action="store_true", help="leer y después sumar (sin reserva atómica)")
+    args = parser.parse_args()
+
+    obtener_pool()  # en SQLite crea la base antes de lanzar los hilos
+    bases, cargas = [], []
+    for _ in range(max(args.repeticiones, 1)):
+        # Alternadas, para que una racha de carga en la máquina afecte a los dos escenarios
+        bases.append(simular(1, args.meta, args.planchas, args.ingenuo))
+        cargas.append(simular(args.operarios, args.meta, args.planchas, args.ingenuo))
+
+    for r in bases + cargas:
+        print(f"{r['operarios']:>3} operario(s): {r['reservas']} reservas, "
+              f"{r['planchas_reservadas']}/{r['meta']} planchas, "
+              f"sobre-asignadas={r['sobre_asignadas']}, errores={r['errores']}, "
+              f"{r['reservas_por_seg']} reservas/s")
+        if r['ultimo_error']:
+            print(f"    último error: {r['ultimo_error']}")
+
+    sobre_asignadas = max(r['sobre_asignadas'] for r in cargas)
+    if sobre_asignadas:
+        raise SystemExit(f"✘ Sobre-asignación: {sobre_asignadas} planchas de más.")
+
+    base, carga = _mediana(bases), _mediana(cargas)
+    print(f"Mediana: 1 operario {base} reservas/s, {args.operarios} operarios {carga} reservas/s")
+    if base and carga is not None and carga < args.tolerancia * base:
+        if not es_sqlite():
+            raise SystemExit(
+                f"✘ El rendimiento con concurrencia cayó a menos de {args.tolerancia:.0%} del de un operario."
+            )
+        print("ℹ️ SQLite serializa todas las escrituras: la caída de rendimiento no se verifica aquí.")
+        print("✔ Sin sobre-asignación.")
+    else:
+        print("✔ Sin sobre-asignación y sin caída de rendimiento.")
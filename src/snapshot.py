@@ -0,0 +1,131 @@
+from dataclasses import dataclass, field
+from src import saldo_lote, referencias
+from src.modelo_ordenes import TablaOrdenes
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FOTO DEL LOTE PARA LA PANTALLA DEL OPERARIO
+# Todo lo que mostrar_pantalla necesita de un lote_padre en una o dos idas a la
+# base:
+#   1. sesión activa del operario + versión actual del lote (siempre)
+#   2. órdenes del lote + saldo (solo si la versión cambió desde la última vez)
+# La lista de máquinas sale de la caché de referencias.
+# ─────────────────────────────────────────────────────────────────────────────
+
+CLAVE_MEMO = 'snapshot_lote'
+
+QUERY_SESION_Y_VERSION = """
+    SELECT s.version AS version_lote, o.lote_padre AS lote_de_sesion, p.*
+    FROM (SELECT %s AS lote_padre) q
+    LEFT JOIN saldo_lote s ON s.lote_padre = q.lote_padre
+    LEFT JOIN produccion p ON p.id_personal = %s AND p.estado = 'procesando'
+    LEFT JOIN ordenes o ON o.lote_completo = p.lote_referencia
+    LIMIT 1
+"""
+
+QUERY_ORDENES_Y_SALDO = """
+    SELECT o.*,
+           s.meta       AS saldo_meta,
+           s.finalizado AS saldo_finalizado,
+           s.en_proceso AS saldo_en_proceso,
+           s.version    AS saldo_version
+    FROM ordenes o
+    LEFT JOIN saldo_lote s ON s.lote_padre = o.lote_padre
+    WHERE o.lote_padre = %s
+    ORDER BY o.lote_completo
+"""
+
+_COLUMNAS_SALDO = ('saldo_meta', 'saldo_finalizado', 'saldo_en_proceso', 'saldo_version')
+
+
+@dataclass(frozen=True)
+class SnapshotLote:
+    lote_padre: str
+    version: object              # saldo_lote.version con la que se leyeron las órdenes
+    ordenes: TablaOrdenes        # órdenes del lote por columnas, ordenadas por lote_completo
+    meta: int = 0
+    finalizado: int = 0
+    en_proceso: int = 0
+    sesion_activa: dict = None   # fila de produccion 'procesando' del operario (cualquier lote)
+    lote_de_sesion: str = None   # lote_padre de esa sesión
+    maquinas: list = field(default_factory=list)
+
+    @property
+    def faltante(self):
+        return self.meta - (self.finalizado + self.en_proceso)
+
+    @property
+    def datos_programados(self):
+        return self.ordenes.fila(0) if self.ordenes else None
+
+    @property
+    def sesion_en_otro_lote(self):
+        return bool(self.sesion_activa and self.lote_de_sesion and self.lote_de_sesion != self.lote_padre)
+
+    @property
+    def mi_sesion(self):
+        """Sesión activa del operario en este lote (o None)."""
+        if self.sesion_activa and self.lote_de_sesion == self.lote_padre:
+            return self.sesion_activa
+        return None
+
+
+def _cargar_lote(conn, cursor, lote_padre):
+    cursor.execute(QUERY_ORDENES_Y_SALDO, (lote_padre,))
+    filas = cursor.fetchall()
+    if not filas:
+        return TablaOrdenes((), ()), None, {}
+
+    saldo = {c: filas[0][c] for c in _COLUMNAS_SALDO}
+    ordenes = TablaOrdenes.desde_filas(filas, excluir=_COLUMNAS_SALDO)
+
+    if saldo['saldo_version'] is None:
+        # Lote sin fila en saldo_lote todavía: se calcula una vez y se guarda,
+        # salvo que la conexión venga de la réplica (ahí no se escribe nada)
+        if getattr(conn, 'solo_lectura', False):
+            fila = saldo_lote.calcular(cursor, lote_padre) or {}
+        else:
+            fila = saldo_lote.obtener(conn, lote_padre) or {}
+        saldo = {'saldo_' + k: fila.get(k) for k in ('meta', 'finalizado', 'en_proceso', 'version')}
+
+    version = saldo['saldo_version']
+    totales = {
+        'meta': int(saldo['saldo_meta'] or 0),
+        'finalizado': int(saldo['saldo_finalizado'] or 0),
+        'en_proceso': int(saldo['saldo_en_proceso'] or 0),
+    }
+    return ordenes, version, totales
+
+
+def cargar_snapshot(conn, lote_padre, id_operario, memo=None):
+    """
+    Devuelve un SnapshotLote. Si se pasa `memo` (p. ej. st.session_state), las
+    órdenes y el saldo se reutilizan mientras la versión del lote no cambie.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(QUERY_SESION_Y_VERSION, (lote_padre, id_operario))
+    fila = cursor.fetchone() or {}
+
+    version_actual = fila.pop('version_lote', None)
+    lote_de_sesion = fila.pop('lote_de_sesion', None)
+    sesion_activa = fila if fila.get('id_registro') is not None else None
+
+    previo = memo.get(CLAVE_MEMO) if memo is not None else None
+    if (previo is not None and version_actual is not None
+            and previo.lote_padre == lote_padre and previo.version == version_actual):
+        ordenes, version = previo.ordenes, previo.version
+        totales = {'meta': previo.meta, 'finalizado': previo.finalizado, 'en_proceso': previo.en_proceso}
+    else:
+        ordenes, version, totales = _cargar_lote(conn, cursor, lote_padre)
+
+    snap = SnapshotLote(
+        lote_padre=lote_padre,
+        version=version,
+        ordenes=ordenes,
+        sesion_activa=sesion_activa,
+        lote_de_sesion=lote_de_sesion,
+        maquinas=referencias.listar_maquinas(conn),
+        **totales
+    )
+    if memo is not None:
+        memo[CLAVE_MEMO] = snap
+    return snap
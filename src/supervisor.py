@@ -1,9 +1,25 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from src.database import get_connection
+from datetime import date, timedelta
+from src.database import get_connection, estadisticas_pool
+from src import ingesta, referencias, trabajos, metricas, exportacion
+
+FILAS_VISTA_PREVIA = 5
+
 
 def mostrar_pantalla():
+    vista = st.sidebar.radio(
+        "Vista:", ["Carga de órdenes", "Análisis de producción", "Exportar producción"],
+        key="vista_supervisor"
+    )
+    if vista == "Análisis de producción":
+        from src import analisis
+        analisis.mostrar_pantalla()
+        return
+    if vista == "Exportar producción":
+        mostrar_exportacion()
+        return
+
     st.title("Panel del Supervisor")
     st.subheader("Carga de Órdenes de Producción")
 
@@ -11,18 +27,60 @@ def mostrar_pantalla():
     if st.button("Cargar un nuevo archivo"):
         st.rerun()
 
-    # 2. El cargador de archivos
-    archivo = st.file_uploader("Sube el archivo Excel (.xlsx)", type=['xlsx'], key="supervisor_upload")
+    # 2. El cargador de archivos: uno o varios libros, cada uno con una o varias hojas
+    archivos = st.file_uploader("Sube los archivos Excel (.xlsx)", type=['xlsx'],
+                                accept_multiple_files=True, key="supervisor_upload")
 
-    if archivo:
+    if archivos:
         try:
-            df = pd.read_excel(archivo)
+            # Solo se leen las primeras filas para la vista previa; las hojas
+            # completas se leen en paralelo recién al guardar.
             st.write("### Vista previa de los datos")
-            st.dataframe(df.head())
+            hojas = {a.name: ingesta.listar_hojas(a) for a in archivos}
+            st.caption(" · ".join(f"{nombre}: {', '.join(h)}" for nombre, h in hojas.items()))
+            st.dataframe(vista_previa_excel(archivos[0]))
+
+            tam_lote = st.number_input(
+                "Filas por lote de escritura:",
+                min_value=100, max_value=10000, value=ingesta.TAMANO_LOTE_DEFECTO, step=100,
+                key="tam_lote_carga"
+            )
+            en_segundo_plano = st.checkbox("Procesar en segundo plano", value=True, key="carga_en_fondo")
+            forzar = st.checkbox("Volver a procesar aunque sea la última carga", value=False,
+                                 key="carga_forzada")
 
             if st.button("Guardar todo en Base de Datos", key="btn_guardar"):
-                # Ejecutamos el guardado
-                procesar_y_guardar(df)
+                usuario = st.session_state.usuario.get('nombre_usuario')
+                nombre_carga = ", ".join(a.name for a in archivos)[:255]
+                huella = ingesta.hash_archivos([(a.name, a) for a in archivos])
+                previa = None if forzar else buscar_carga_previa(huella)
+
+                if previa:
+                    st.info(
+                        f"Estos archivos son la última carga, del {previa['cargado']:%d/%m/%Y %H:%M} "
+                        f"({previa['filas']} filas, {previa['archivo']}). No hay cambios que guardar."
+                    )
+                else:
+                    # Copia a disco por bloques: los procesos de lectura reciben rutas
+                    rutas = ingesta.copiar_a_temporales([(a.name, a) for a in archivos])
+                    if en_segundo_plano:
+                        # La carga sigue aunque se cierre la pestaña; el estado se ve abajo
+                        id_trabajo = trabajos.encolar(rutas, usuario, tam_lote, huella)
+                        st.success(f"Carga #{id_trabajo} en cola. Puede seguir usando el panel.")
+                    else:
+                        try:
+                            with st.spinner("Leyendo hojas..."):
+                                plan = ingesta.parsear_archivos(rutas)
+                            with plan:
+                                st.dataframe(pd.DataFrame(plan.hojas), hide_index=True)
+                                if plan.errores:
+                                    st.error("No se guardó nada:\n\n" + "\n".join(f"- {e}" for e in plan.errores))
+                                else:
+                                    st.caption(f"{plan.total} órdenes leídas en {plan.segundos:.2f} s")
+                                    procesar_y_guardar(plan.bloques(int(tam_lote)), plan.total,
+                                                       registro=(huella, nombre_carga, usuario))
+                        finally:
+                            ingesta.borrar_temporales(rutas)
                 
                 # Mensaje final y opción de continuar
                 st.info("Para subir otro archivo diferente, presiona el botón 'Cargar un nuevo archivo' arriba.")
@@ -30,54 +88,165 @@ def mostrar_pantalla():
         except Exception as e:
             st.error(f"Error al leer el archivo: {e}")
 
-def procesar_y_guardar(df):
-    # (El resto de tu código de guardado se mantiene igual aquí...)
+    mostrar_trabajos()
+
+    if st.toggle("Mostrar rendimiento de consultas", value=False, key="ver_metricas"):
+        mostrar_metricas()
+
+
+@st.fragment(run_every=3)
+def mostrar_trabajos():
+    """Se refresca sola cada pocos segundos sin re-ejecutar el resto de la pantalla."""
+    st.markdown("#### 📥 Cargas recientes")
+    try:
+        with metricas.en_pagina('supervisor/cargas'):
+            lista = trabajos.listar(10)
+    except Exception as e:
+        st.caption(f"No se pudo leer el estado de las cargas: {e}")
+        return
+    if not lista:
+        st.caption("Sin cargas registradas.")
+        return
+
+    df = pd.DataFrame(lista)
+    df['avance'] = [
+        1.0 if t['estado'] == 'completado'
+        else (t['filas_procesadas'] / t['filas_total'] if t['filas_total'] else 0.0)
+        for t in lista
+    ]
+    st.dataframe(
+        df[['id', 'archivo', 'usuario', 'estado', 'avance', 'filas_procesadas', 'insertadas',
+            'actualizadas', 'sin_cambios', 'duracion_seg', 'creado', 'error']],
+        hide_index=True,
+        use_container_width=True,
+        column_config={'avance': st.column_config.ProgressColumn(min_value=0.0, max_value=1.0)}
+    )
+
+
+def mostrar_exportacion():
+    st.title("Exportar Producción")
+    hoy = date.today()
+    rango = st.date_input("Rango de fechas (hora de inicio):", value=(hoy - timedelta(days=7), hoy),
+                          key="exportar_rango")
+    if not isinstance(rango, (tuple, list)) or len(rango) != 2:
+        st.info("Seleccione la fecha de inicio y la de fin.")
+        return
+    desde, hasta = rango
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        tabla = st.selectbox("Datos:", list(exportacion.CONSULTAS), key="exportar_tabla")
+    with col2:
+        lote_padre = st.text_input("LOTE padre (opcional):", key="exportar_lote").strip() or None
+    with col3:
+        formato = st.radio("Formato:", ["csv", "xlsx"], horizontal=True, key="exportar_formato")
+
+    def generar():
+        # Se ejecuta recién al hacer clic: el archivo se arma en disco por bloques,
+        # leyendo de la réplica si hay una. Streamlit lo sirve desde memoria, por
+        # eso tiene tope (EXPORTACION_MAX_MB).
+        conn = get_connection(solo_lectura=True)
+        if not conn:
+            raise ConnectionError("No se pudo conectar a la base de datos.")
+        try:
+            return exportacion.exportar_para_descarga(conn, tabla, desde, hasta, lote_padre, formato)
+        finally:
+            conn.close()
+
+    nombre = f"{tabla}_{desde:%Y%m%d}_{hasta:%Y%m%d}{'_' + lote_padre if lote_padre else ''}.{formato}"
+    st.download_button(
+        "⬇️ Descargar", data=generar, file_name=nombre, on_click="ignore",
+        mime="text/csv" if formato == "csv"
+        else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key="btn_exportar"
+    )
+    st.caption(
+        f"Desde aquí se descargan hasta {exportacion.MAX_MB_DESCARGA:.0f} MB. Para rangos más "
+        "grandes: python -m src.exportacion (escribe directo al archivo, sin cargarlo en memoria)."
+    )
+
+
+def mostrar_metricas():
+    """Consultas medidas en este proceso desde el arranque (o desde el último reinicio)."""
+    st.markdown("#### ⏱️ Rendimiento de consultas")
+    st.caption(f"Log de lentas: consultas de {metricas.UMBRAL_LENTO_MS:.0f} ms o más (SQL_LENTO_MS).")
+
+    paginas = metricas.resumen_paginas()
+    if not paginas:
+        st.caption("Todavía no hay consultas medidas.")
+    else:
+        st.dataframe(pd.DataFrame(paginas), hide_index=True, use_container_width=True)
+        st.markdown("**Consultas con más tiempo acumulado**")
+        st.dataframe(
+            pd.DataFrame(metricas.consultas_mas_costosas())[
+                ['funcion', 'veces', 'total_ms', 'promedio_ms', 'max_ms', 'filas', 'huella']
+            ],
+            hide_index=True, use_container_width=True
+        )
+
+    st.markdown("**Pool de conexiones**")
+    st.json(estadisticas_pool())
+    if st.button("Reiniciar métricas", key="btn_reiniciar_metricas"):
+        metricas.reiniciar()
+        st.rerun()
+
+
+def vista_previa_excel(archivo, n=FILAS_VISTA_PREVIA):
+    libro, hoja = ingesta.abrir_hoja(archivo)
+    try:
+        filas = hoja.iter_rows(max_row=n + 1, values_only=True)
+        encabezado = next(filas, None) or ()
+        columnas = [str(c).strip() if c is not None else "" for c in encabezado]
+        return pd.DataFrame([list(f) for f in filas], columns=columnas)
+    finally:
+        libro.close()
+
+
+def buscar_carga_previa(huella):
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        return ingesta.buscar_archivo(conn, huella)
+    finally:
+        conn.close()
+
+
+def procesar_y_guardar(bloques, total=None, registro=None):
+    """`registro`: (hash, nombre, usuario) del archivo para archivos_ingesta."""
     conn = get_connection()
     if not conn:
         st.error("No se pudo conectar a la base de datos.")
         return
 
     try:
-        cursor = conn.cursor()
-        df = df.replace({np.nan: None})
-        exitos = 0
-        
-        for index, row in df.iterrows():
-            lote_completo = str(row['LOTE'])
-            lote_padre = lote_completo.split('-')[0]
-
-            query = """
-                INSERT INTO ordenes (
-                    lote_completo, lote_padre, id_maquina, nombre_maquina, 
-                    cantidad_planchas, ancho_pl, desaplancha, espesor, 
-                    calidad, largo, desarrollo, cant, can_total, 
-                    destino, cof_FA, cod_SAP, cod_UTIL, cod_IBS, 
-                    peso_unitario, peso_total, orden, lot_insp, 
-                    COD_proceso, descrip_SAP
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    cantidad_planchas = VALUES(cantidad_planchas),
-                    can_total = VALUES(can_total),
-                    peso_total = VALUES(peso_total)
-            """
-
-            valores = (
-                lote_completo, lote_padre, row['ID MAQUINA'], row['MAQUINA'],
-                row['Cant. Planchas'], row['Ancho Pl.'], row['Desaplancha'],
-                row['Espesor'], row['Calidad'], row['Largo'], row['Desarrollo'],
-                row['Cant.'], row['can.total'], row['Destino'], row['COD.FA'],
-                row['COD.SAP'], row['COD.UTIL'], row['COD.IBS'], row['Peso Unt.'],
-                row['Peso Total'], row['ORDEN'], row['Lot. Insp.'], row['COD'],
-                row['DESCRIP. SAP']
-            )
+        barra = st.progress(0.0, text="Guardando órdenes...")
 
-            cursor.execute(query, valores)
-            exitos += 1
+        def al_avanzar(info_lote, hechas):
+            avance = min(hechas / total, 1.0) if total else 0.0
+            barra.progress(avance, text=f"Lote {info_lote['lote']}: {hechas:,} filas guardadas")
 
+        resumen = ingesta.guardar_ordenes(conn, bloques, al_avanzar)
+        filas = sum(r['filas'] for r in resumen)
+        if registro:
+            huella, nombre_archivo, usuario = registro
+            ingesta.registrar_archivo(conn.cursor(), huella, nombre_archivo, filas, usuario)
         conn.commit()
-        st.success(f"Se han guardado {exitos} registros correctamente.")
+        referencias.invalidar()
+        barra.progress(1.0, text="Carga completa")
+
+        insertadas = sum(r['insertadas'] for r in resumen)
+        actualizadas = sum(r['actualizadas'] for r in resumen)
+        sin_cambios = sum(r['sin_cambios'] for r in resumen)
+        st.success(
+            f"Se procesaron {filas} registros correctamente "
+            f"({insertadas} nuevos, {actualizadas} modificados, {sin_cambios} sin cambios)."
+        )
+        if resumen:
+            st.dataframe(pd.DataFrame(resumen), hide_index=True)
 
     except Exception as e:
+        conn.rollback()
         st.error(f"Error al procesar los datos: {e}")
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
@@ -0,0 +1,257 @@
+import os
+import secrets
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from src.database import get_connection
+from src import ingesta, referencias, metricas
+
+# ─────────────────────────────────────────────────────────────────────────────
+# TRABAJOS DE INGESTA EN SEGUNDO PLANO
+# La carga de un plan llega copiada a archivos temporales y se procesa en un
+# pool de hilos del proceso, fuera del rerun de Streamlit: cerrar la pestaña ya no
+# corta el commit. El estado de cada trabajo (filas, errores, tiempos) queda en
+# trabajos_ingesta y el panel del supervisor solo consulta esa tabla.
+#   INGESTA_WORKERS     → cargas que pueden correr en paralelo
+#   INGESTA_LATIDO_SEG  → cada cuánto el proceso dueño renueva sus trabajos
+#
+# Cada trabajo guarda el proceso que lo encoló (host:pid:sufijo) y un latido
+# que ese proceso renueva mientras el trabajo sigue abierto. Puede haber
+# varios procesos de la app (réplicas, o varios streamlit detrás de un
+# balanceador): un trabajo solo se da por interrumpido cuando su latido lleva
+# más de 3 intervalos sin renovarse, es decir, cuando el proceso dueño ya no
+# está. El hilo de latido arranca con el pool (el primer encolar o el primer
+# sondeo del panel) y en cada vuelta también marca los huérfanos de otros.
+# Los relojes de los servidores deben coincidir dentro de ese margen.
+# ─────────────────────────────────────────────────────────────────────────────
+
+DDL_TRABAJOS = """
+    CREATE TABLE IF NOT EXISTS trabajos_ingesta (
+        id                INT NOT NULL AUTO_INCREMENT,
+        archivo           VARCHAR(255) NOT NULL,
+        usuario           VARCHAR(50),
+        estado            VARCHAR(20) NOT NULL DEFAULT 'en_cola',
+        filas_total       INT,
+        filas_procesadas  INT NOT NULL DEFAULT 0,
+        insertadas        INT NOT NULL DEFAULT 0,
+        actualizadas      INT NOT NULL DEFAULT 0,
+        sin_cambios       INT NOT NULL DEFAULT 0,
+        error             TEXT,
+        creado            DATETIME NOT NULL,
+        proceso           VARCHAR(100),
+        latido            DATETIME,
+        iniciado          DATETIME,
+        terminado         DATETIME,
+        duracion_seg      DECIMAL(10,2),
+        PRIMARY KEY (id),
+        KEY idx_trabajos_estado (estado)
+    )
+"""
+
+_CAMPOS = {'estado', 'filas_total', 'filas_procesadas', 'insertadas', 'actualizadas',
+           'sin_cambios', 'error', 'iniciado', 'terminado', 'duracion_seg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+PROCESO = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"[:100]
+LATIDO_SEG = float(os.getenv("INGESTA_LATIDO_SEG", 30))
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("INGESTA_WORKERS", 2)),
+                    thread_name_prefix="ingesta"
+                )
+                threading.Thread(target=_latir, name="ingesta-latido", daemon=True).start()
+    return _executor
+
+
+def _latir():
+    """Renueva los trabajos abiertos de este proceso y marca los de procesos caídos."""
+    while True:
+        try:
+            renovar_latido()
+            marcados = marcar_interrumpidos()
+            if marcados:
+                print(f"{marcados} trabajo(s) de ingesta de un proceso caído marcados como interrumpidos.")
+        except Exception as e:
+            print(f"Error en el latido de trabajos de ingesta: {e}")
+        time.sleep(LATIDO_SEG)
+
+
+def crear_tabla(cursor):
+    cursor.execute(DDL_TRABAJOS)
+
+
+def _actualizar(id_trabajo, **campos):
+    """Escribe el estado en su propia conexión: se ve aunque la carga no haya hecho commit."""
+    columnas = [c for c in campos if c in _CAMPOS]
+    conn = get_connection()
+    if not conn:
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE trabajos_ingesta SET {', '.join(f'{c} = %s' for c in columnas)} WHERE id = %s",
+            (*[campos[c] for c in columnas], id_trabajo)
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"Error al actualizar trabajo {id_trabajo}: {e}")
+    finally:
+        conn.close()
+
+
+def encolar(rutas, usuario=None, tam_lote=ingesta.TAMANO_LOTE_DEFECTO, huella=None):
+    """
+    `rutas`: [(nombre, ruta)] de ingesta.copiar_a_temporales; el trabajo las
+    borra al terminar. Registra el trabajo y lo manda al pool. Devuelve el id
+    del trabajo. `huella` (ingesta.hash_archivos) se guarda en
+    archivos_ingesta al terminar.
+    """
+    nombre_carga = ", ".join(n for n, _ in rutas)[:255]
+
+    conn = get_connection()
+    try:
+        if not conn:
+            raise ConnectionError("No se pudo conectar a la base de datos.")
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO trabajos_ingesta (archivo, usuario, estado, creado, proceso, latido) "
+            "VALUES (%s, %s, 'en_cola', %s, %s, %s)",
+            (nombre_carga, usuario, datetime.now(), PROCESO, datetime.now())
+        )
+        id_trabajo = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        ingesta.borrar_temporales(rutas)
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+    _pool().submit(_ejecutar, id_trabajo, rutas, int(tam_lote), nombre_carga, usuario, huella)
+    return id_trabajo
+
+
+def _ejecutar(id_trabajo, rutas, tam_lote, nombre_carga=None, usuario=None, huella=None):
+    with metricas.en_pagina('trabajo_ingesta'):
+        _procesar(id_trabajo, rutas, tam_lote, nombre_carga, usuario, huella)
+
+
+def _procesar(id_trabajo, rutas, tam_lote, nombre_carga, usuario, huella):
+    inicio = time.monotonic()
+    _actualizar(id_trabajo, estado='procesando', iniciado=datetime.now())
+    totales = {'insertadas': 0, 'actualizadas': 0, 'sin_cambios': 0}
+
+    conn = None
+    plan = None
+    try:
+        # Lectura en paralelo de todas las hojas; si algo no valida no se escribe nada
+        plan = ingesta.parsear_archivos(rutas)
+        if plan.errores:
+            raise ValueError("; ".join(plan.errores))
+        _actualizar(id_trabajo, filas_total=plan.total)
+
+        conn = get_connection()
+        if not conn:
+            raise ConnectionError("No se pudo conectar a la base de datos.")
+
+        def al_avanzar(info_lote, hechas):
+            for clave in totales:
+                totales[clave] += info_lote[clave]
+            _actualizar(id_trabajo, filas_procesadas=hechas, **totales)
+
+        ingesta.guardar_ordenes(conn, plan.bloques(tam_lote), al_avanzar)
+
+        if huella:
+            ingesta.registrar_archivo(conn.cursor(), huella, nombre_carga, plan.total, usuario)
+        conn.commit()
+        referencias.invalidar()
+        _actualizar(id_trabajo, estado='completado', terminado=datetime.now(),
+                    duracion_seg=round(time.monotonic() - inicio, 2), **totales)
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        _actualizar(id_trabajo, estado='error', error=str(e)[:2000], terminado=datetime.now(),
+                    duracion_seg=round(time.monotonic() - inicio, 2))
+    finally:
+        if conn:
+            conn.close()
+        if plan:
+            plan.cerrar()
+        ingesta.borrar_temporales(rutas)
+
+
+def listar(limite=10):
+    """Últimos trabajos, del más nuevo al más viejo (lectura por PK, barata para sondear)."""
+    _pool()  # arranca el latido: los trabajos de procesos caídos pasan a 'error'
+    conn = get_connection()
+    if not conn:
+        return []
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, archivo, usuario, estado, filas_total, filas_procesadas,
+                   insertadas, actualizadas, sin_cambios, error, creado, iniciado, terminado, duracion_seg
+            FROM trabajos_ingesta
+            ORDER BY id DESC
+            LIMIT %s
+        """, (int(limite),))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def renovar_latido():
+    """Marca como vivos los trabajos abiertos de este proceso."""
+    conn = get_connection()
+    if not conn:
+        return
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE trabajos_ingesta SET latido = %s
+            WHERE proceso = %s AND estado IN ('en_cola', 'procesando')
+        """, (datetime.now(), PROCESO))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def marcar_interrumpidos(sin_latido_desde=None):
+    """
+    Pasa a 'error' los trabajos abiertos de otros procesos cuyo latido no se
+    renueva desde `sin_latido_desde` (por defecto, 3 intervalos de latido).
+    Los trabajos anteriores a la columna latido se juzgan por su fecha de creación.
+    """
+    limite = sin_latido_desde or datetime.now() - timedelta(seconds=3 * LATIDO_SEG)
+    conn = get_connection()
+    if not conn:
+        return 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE trabajos_ingesta
+            SET estado = 'error', error = 'Interrumpido: el proceso que lo ejecutaba ya no responde',
+                terminado = %s
+            WHERE estado IN ('en_cola', 'procesando')
+              AND (proceso IS NULL OR proceso <> %s)
+              AND COALESCE(latido, creado) < %s
+        """, (datetime.now(), PROCESO, limite))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(f"{marcar_interrumpidos()} trabajo(s) marcados como interrumpidos.")
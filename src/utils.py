@@ -0,0 +1,231 @@
+import os
+import re
+from functools import lru_cache
+
+# ─────────────────────────────────────────────────────────────────────────────
+# DIALECTO SQL
+# Las consultas del proyecto están escritas para MySQL. En modo SQLite
+# (DB_MOTOR=sqlite) cada sentencia pasa por mysql_a_sqlite antes de
+# ejecutarse; la traducción queda en caché porque las mismas consultas se
+# repiten en cada rerun.
+#
+#   %s                          → ?
+#   ON DUPLICATE KEY UPDATE     → ON CONFLICT DO UPDATE SET
+#   VALUES(col) (en el UPDATE)  → excluded.col
+#   NOW()                       → datetime('now', 'localtime')
+#   GREATEST / LEAST            → MAX / MIN (escalares)
+#   TIME_TO_SEC(col)            → segundos desde 00:00:00 con julianday
+#   FOR UPDATE                  → (se quita: SQLite bloquea la base entera)
+#   DDL: AUTO_INCREMENT, UNIQUE KEY, KEY, ON UPDATE CURRENT_TIMESTAMP
+# ─────────────────────────────────────────────────────────────────────────────
+
+_RE_AUTOINC = re.compile(r"(\w+)\s+INT\s+NOT\s+NULL\s+AUTO_INCREMENT", re.I)
+_RE_UNIQUE_KEY = re.compile(r"UNIQUE\s+KEY\s+\w+\s*\(", re.I)
+_RE_KEY = re.compile(r",\s*KEY\s+\w+\s*\([^)]*\)", re.I)
+_RE_ON_UPDATE = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP", re.I)
+_RE_DUPLICADO = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_RE_VALUES_COL = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.I)
+_RE_NOW = re.compile(r"\bNOW\(\)", re.I)
+_RE_GREATEST = re.compile(r"\bGREATEST\s*\(", re.I)
+_RE_LEAST = re.compile(r"\bLEAST\s*\(", re.I)
+_RE_TIME_TO_SEC = re.compile(r"\bTIME_TO_SEC\(\s*([\w.]+)\s*\)", re.I)
+_RE_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.I)
+
+
+def _fuera_de_parentesis(texto):
+    """El texto sin lo que está entre paréntesis (subconsultas, listas de columnas)."""
+    nivel, partes = 0, []
+    for c in texto:
+        if c == "(":
+            nivel += 1
+        elif c == ")":
+            nivel -= 1
+        elif nivel == 0:
+            partes.append(c)
+    return "".join(partes)
+
+
+def _traducir_ddl(sql):
+    m = _RE_AUTOINC.search(sql)
+    if m:
+        columna = m.group(1)
+        sql = _RE_AUTOINC.sub(f"{columna} INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+        sql = re.sub(rf",\s*PRIMARY\s+KEY\s*\(\s*{columna}\s*\)", "", sql, flags=re.I)
+    sql = _RE_UNIQUE_KEY.sub("UNIQUE (", sql)
+    sql = _RE_KEY.sub("", sql)
+    return _RE_ON_UPDATE.sub("", sql)
+
+
+def _traducir_upsert(sql):
+    m = _RE_DUPLICADO.search(sql)
+    insercion, actualizacion = sql[:m.start()], sql[m.end():]
+    # INSERT ... SELECT: sin un WHERE el ON de ON CONFLICT se confunde con el de un JOIN
+    fuera = _fuera_de_parentesis(insercion).upper()
+    if "SELECT" in fuera and not re.search(r"\bWHERE\b", fuera.split("SELECT", 1)[1]):
+        insercion = insercion.rstrip() + " WHERE true\n"
+    actualizacion = _RE_VALUES_COL.sub(r"excluded.\1", actualizacion)
+    return f"{insercion}ON CONFLICT DO UPDATE SET{actualizacion}"
+
+
+@lru_cache(maxsize=1024)
+def mysql_a_sqlite(sql):
+    if re.match(r"\s*CREATE\s+TABLE", sql, re.I):
+        sql = _traducir_ddl(sql)
+    if _RE_DUPLICADO.search(sql):
+        sql = _traducir_upsert(sql)
+    sql = _RE_NOW.sub("datetime('now', 'localtime')", sql)
+    sql = _RE_GREATEST.sub("MAX(", sql)
+    sql = _RE_LEAST.sub("MIN(", sql)
+    sql = _RE_TIME_TO_SEC.sub(r"CAST(ROUND((julianday(\1) - julianday('00:00:00')) * 86400) AS INTEGER)", sql)
+    sql = _RE_FOR_UPDATE.sub("", sql)
+    return sql.replace("%s", "?")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# REGISTRO DE SENTENCIAS
+# Las escrituras que más se repiten, definidas una sola vez. Se ejecutan con
+# ConexionPool.ejecutar / ejecutar_filas (src/database.py): en MySQL cada una
+# se prepara en el servidor la primera vez que se usa en una conexión del pool
+# y se reutiliza mientras la conexión viva. mysql.connector reconoce la
+# sentencia ya preparada por identidad del str, por eso el texto sale siempre
+# de sentencia() (que devuelve el mismo objeto para los mismos argumentos).
+#
+# Las de varias filas se arman para bloques de 1, 2, 4, ... hasta
+# SQL_FILAS_POR_SENTENCIA filas (13 filas → 8 + 4 + 1): cada conexión
+# prepara a lo sumo unas pocas variantes, no una por cada cantidad de filas.
+# ─────────────────────────────────────────────────────────────────────────────
+
+FILAS_POR_SENTENCIA = int(os.getenv("SQL_FILAS_POR_SENTENCIA", 128))
+
+SENTENCIAS = {
+    # Una fila de produccion 'procesando' por cada orden del lote
+    'insertar_tanda': """
+        INSERT INTO produccion
+        (lote_referencia, id_personal, planchas_procesadas, maquina_real, maq_proces,
+        operador, hora_inicio, estado, orden, can_total, desarrollo, largo, espesor,
+        peso_unitario, fecha_emision)
+        SELECT lote_completo, %s, %s, %s, %s, %s, %s, 'procesando', orden, can_total,
+               desarrollo, largo, espesor, peso_unitario, fecha_subida
+        FROM ordenes
+        WHERE lote_padre = %s
+        ORDER BY lote_completo
+    """,
+}
+
+
+def _filas(n, marcadores):
+    return ",\n        ".join([marcadores] * n)
+
+
+COLUMNAS_UPSERT_ORDENES = [
+    'lote_completo', 'lote_padre', 'id_maquina', 'nombre_maquina',
+    'cantidad_planchas', 'ancho_pl', 'desaplancha', 'espesor',
+    'calidad', 'largo', 'desarrollo', 'cant', 'can_total',
+    'destino', 'cof_FA', 'cod_SAP', 'cod_UTIL', 'cod_IBS',
+    'peso_unitario', 'peso_total', 'orden', 'lot_insp',
+    'COD_proceso', 'descrip_SAP', 'hash_fila'
+]
+
+# Lo único que una carga nueva cambia de una orden existente (hash_fila cubre
+# exactamente estas columnas, ver src/ingesta.py)
+COLUMNAS_ACTUALIZABLES_ORDENES = ['cantidad_planchas', 'can_total', 'peso_total']
+
+
+def _sql_upsert_ordenes(n):
+    actualizar = ",\n        ".join(
+        f"{c} = VALUES({c})" for c in COLUMNAS_ACTUALIZABLES_ORDENES + ['hash_fila']
+    )
+    return f"""
+    INSERT INTO ordenes (
+        {", ".join(COLUMNAS_UPSERT_ORDENES)}
+    ) VALUES
+        {_filas(n, "(" + ", ".join(["%s"] * len(COLUMNAS_UPSERT_ORDENES)) + ")")}
+    ON DUPLICATE KEY UPDATE
+        {actualizar}
+    """
+
+
+def _sql_insertar_produccion(n):
+    """Órdenes agregadas por el operario, ya finalizadas."""
+    return f"""
+    INSERT INTO produccion
+    (lote_referencia, id_personal, planchas_procesadas, maquina_real, maq_proces,
+     operador, hora_inicio, hora_fin, estado, orden, can_total, desarrollo, largo,
+     espesor, peso_unitario, peso_total, lote_de_planchas, ancho_real,
+     observacciones, tiempo_total, cant_cortada_real, ancho_fleje_real,
+     destino_real, merma, tiempo_ponderado)
+    VALUES
+        {_filas(n, "(" + ", ".join(["%s"] * 8 + ["'finalizado'"] + ["%s"] * 16) + ")")}
+    """
+
+
+COLUMNAS_CIERRE = ['peso_total', 'cant_cortada_real', 'ancho_fleje_real',
+                   'destino_real', 'merma', 'tiempo_ponderado']
+
+
+def _sql_cerrar_produccion(n):
+    """
+    Cierra n filas de produccion. Parámetros: (hora_fin, lote_de_planchas,
+    ancho_real, observacciones, tiempo_total), luego por columna de
+    COLUMNAS_CIERRE los pares (id_registro, valor), y al final los n id_registro.
+    """
+    casos = ",\n            ".join(
+        f"{col} = CASE id_registro " + " ".join(["WHEN %s THEN %s"] * n) + " END"
+        for col in COLUMNAS_CIERRE
+    )
+    return f"""
+        UPDATE produccion
+        SET hora_fin            = %s,
+            estado              = 'finalizado',
+            lote_de_planchas    = %s,
+            ancho_real          = %s,
+            observacciones      = %s,
+            tiempo_total        = %s,
+            {casos}
+        WHERE id_registro IN ({", ".join(["%s"] * n)})
+    """
+
+
+def _params_cerrar_produccion(comunes, filas):
+    """`filas`: (id_registro, peso_total, cant_cortada_real, ancho_fleje_real, destino_real, merma, tiempo_ponderado)."""
+    params = list(comunes)
+    for pos in range(1, len(COLUMNAS_CIERRE) + 1):
+        for f in filas:
+            params.extend((f[0], f[pos]))
+    params.extend(f[0] for f in filas)
+    return params
+
+
+def _params_filas(comunes, filas):
+    return [*comunes, *(v for f in filas for v in f)]
+
+
+# nombre → (SQL para n filas, parámetros a partir de (comunes, filas))
+SENTENCIAS_MULTIFILA = {
+    'upsert_ordenes': (_sql_upsert_ordenes, _params_filas),
+    'insertar_produccion': (_sql_insertar_produccion, _params_filas),
+    'cerrar_produccion': (_sql_cerrar_produccion, _params_cerrar_produccion),
+}
+
+
+@lru_cache(maxsize=None)
+def sentencia(nombre, filas=None):
+    """SQL registrado como `nombre`; las de varias filas llevan `filas` (tamaño del bloque)."""
+    if filas is None:
+        return SENTENCIAS[nombre]
+    return SENTENCIAS_MULTIFILA[nombre][0](filas)
+
+
+def parametros(nombre, comunes, filas):
+    return SENTENCIAS_MULTIFILA[nombre][1](comunes, filas)
+
+
+def partir_en_bloques(filas, maximo=None):
+    """Bloques de tamaño potencia de 2, hasta `maximo` filas: 13 filas → 8 + 4 + 1."""
+    maximo = max(int(maximo or FILAS_POR_SENTENCIA), 1)
+    maximo = 1 << (maximo.bit_length() - 1)
+    inicio = 0
+    while inicio < len(filas):
+        n = min(maximo, 1 << ((len(filas) - inicio).bit_length() - 1))
+        yield filas[inicio:inicio + n]
+        inicio += n